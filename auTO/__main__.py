@@ -1,3 +1,14 @@
-from . import auTO
+import sys
 
-auTO.main()
+if sys.argv[1:2] == ['simulate']:
+    from . import simulate
+
+    simulate.main(sys.argv[2:])
+elif sys.argv[1:2] == ['replay']:
+    from . import replay
+
+    replay.main(sys.argv[2:])
+else:
+    from . import auTO
+
+    auTO.main()
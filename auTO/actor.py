@@ -0,0 +1,69 @@
+"""Serializes changes to a tournament's state."""
+import asyncio
+
+
+async def run_into(future: asyncio.Future, coro):
+    """Await |coro| and resolve |future| with how it went."""
+    try:
+        result = await coro
+    except Exception as e:  # pylint: disable=broad-except
+        if not future.done():
+            future.set_exception(e)
+    else:
+        if not future.done():
+            future.set_result(result)
+    finally:
+        # Only still pending if we were cancelled.
+        if not future.done():
+            future.cancel()
+
+
+class Actor():
+    """Runs a tournament's state changes one at a time, in the order they
+    were asked for.
+
+    Each tournament has its own, so separate tournaments still run in
+    parallel. Work submitted from inside the actor runs right away instead
+    of waiting behind itself.
+    """
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.current = None
+        self.closed = False
+
+    async def run(self, factory):
+        """Run |factory|, a function returning a coroutine, once everything
+        queued before it is done. Returns its result."""
+        if self.task is not None and self.task is asyncio.current_task():
+            return await factory()
+        if self.closed:
+            raise asyncio.CancelledError()
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._loop())
+
+        future = asyncio.get_event_loop().create_future()
+        self.queue.put_nowait((factory, future))
+        return await future
+
+    def close(self):
+        """Stop running work. Anything still queued is cancelled."""
+        self.closed = True
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+            if self.current is not None:
+                self.current.cancel()
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+    async def _loop(self):
+        while not self.closed:
+            factory, future = await self.queue.get()
+            if future.done():
+                continue
+            self.current = future
+            try:
+                await run_into(future, factory())
+            finally:
+                self.current = None
@@ -1,39 +1,48 @@
 import asyncio
 import functools
 import logging
-import os
-import pickle
+import multiprocessing
 import re
+import signal
 import sys
-from typing import Optional
+import time
+from typing import Dict, List, Optional, Union
 
-import aiohttp
 from aiohttp.client_exceptions import ClientResponseError
 import discord
 from discord.ext import commands
 
+from .brackets import (Brackets, has_player_tourney, has_tourney,
+                       load_tournaments)
 from . import challonge
+from . import metrics
 from .config import config, DEBUG
 from .help import help
+from .journal import Journal
 from .match import Match
-from .tournament import Tournament, TournamentPickle, FakeContext
+from .members import MemberIndex
+from .mutations import MutationScheduler
+from .refresh import RefreshScheduler
+from .status import StatusServer
+from .tournament import Tournament
+from .transport import LiveTransport, RecordingTransport
 from . import utils
 
-PICKLE_FILE = 'auTO.pickle'
+# Seconds between shard lease heartbeats when running sharded.
+HEARTBEAT_INTERVAL = 30
+# Seconds to wait for an answer to a yes/no DM.
+CONFIRM_TIMEOUT = 30 * 60
 log = logging.getLogger(__name__)
 
 
-def has_tourney(func):
-    """Decorator that returns if no tourney is set."""
+def serialized(func):
+    """Decorator that runs the command in the tournament's actor, after any
+    changes already queued for it."""
     @functools.wraps(func)
     async def wrapper(self, *args, **kwargs):
-        ctx = args[0]
-        tourney = self.tournament_map.get(ctx.guild)
-        if tourney is None:
-            await ctx.send('No tournament running.')
-            return
-        kwargs['tourney'] = tourney
-        return await func(self, *args, **kwargs)
+        tourney = kwargs['tourney']
+        return await tourney.actor.run(
+            functools.partial(func, self, *args, **kwargs))
     return wrapper
 
 
@@ -58,58 +67,143 @@ class ChallongeError(Exception):
 
 
 class auTO(commands.Cog):
-    def __init__(self, bot, saved):
+    def __init__(self, bot, saved, journal, worker=0):
         self.bot = bot
+        # Which worker process this is, when running sharded.
+        self.worker = worker
         self.saved = saved
-        self.tournament_map = {}
-        self.session = aiohttp.ClientSession(raise_for_status=True)
-
-    def _save(self):
-        if not self.tournament_map:
+        self.journal = journal
+        self.brackets = Brackets(self._tourney_start, journal)
+        self.member_indexes = {}
+        self.mutation_schedulers = {}
+        self.transport = LiveTransport()
+        if config.get('RECORD_CASSETTE'):
+            self.transport = RecordingTransport(
+                self.transport, config['RECORD_CASSETTE'])
+        self.metrics_server = None
+        self.status_server = StatusServer(self.brackets.all)
+        self.heartbeat = None
+
+    async def _save(self):
+        """Write out the latest state of every tournament.
+
+        Changes are journaled as they happen, this just catches anything
+        that changed in place since (e.g. renamed players).
+        """
+        tourneys = self.brackets.all()
+        if not tourneys:
             return
-        tournament_pickle = {}
-        for tourney in self.tournament_map.values():
-            tp = TournamentPickle(tourney)
-            for id, m in tourney.called_matches.items():
-                try:
-                    tp.matches[id] = m.pickle()
-                except AttributeError:
-                    continue
-
-            tournament_pickle[tourney.guild.id] = tp
-
-        with open(PICKLE_FILE, 'wb') as f:
-            pickle.dump(tournament_pickle, f)
+        saves = []
+        for tourney in tourneys:
+            saves.append(tourney.save())
+            saves.extend(tourney.save_match(m)
+                         for m in tourney.called_matches.values())
+        with metrics.SAVES.time(kind='snapshot'):
+            await asyncio.gather(*saves)
         log.info('Saved active tournaments.')
 
+    @property
+    def shard_ids(self) -> Optional[List[int]]:
+        """The shards this process owns, if we're running sharded."""
+        return getattr(self.bot, 'shard_ids', None)
+
     async def close(self):
-        self._save()
-        await self.session.close()
+        await self._save()
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+        if self.shard_ids:
+            await self.journal.release_shards(self.shard_ids)
+        self.journal.close()
+        for scheduler in self.mutation_schedulers.values():
+            scheduler.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.cleanup()
+        await self.status_server.stop()
+        await self.transport.close()
+
+    async def cog_before_invoke(self, ctx):
+        ctx.started_at = time.perf_counter()
+
+    async def cog_after_invoke(self, ctx):
+        """Called even if the command failed."""
+        started_at = getattr(ctx, 'started_at', None)
+        if started_at is None:
+            return
+        metrics.COMMANDS.observe(
+            time.perf_counter() - started_at, command=ctx.command.name,
+            guild=str(ctx.guild.id) if ctx.guild else 'dm')
+
+    async def no_tourney(self, ctx, username=None):
+        """Explain why no tournament was found for the command."""
+        if self.brackets.is_ambiguous(ctx.guild, username):
+            await ctx.send('Several tournaments are running, use the '
+                           'channel of the one you mean.')
+        elif username is not None and self.brackets.in_guild(ctx.guild):
+            await ctx.send(f'{username} not found in current matches.')
+        else:
+            await ctx.send('No tournament running.')
+
+    def _members(self, guild) -> MemberIndex:
+        """Get the guild's member index, building it the first time."""
+        index = self.member_indexes.get(guild.id)
+        if index is None:
+            index = MemberIndex(guild)
+            self.member_indexes[guild.id] = index
+        return index
+
+    def _mutations(self, guild) -> MutationScheduler:
+        scheduler = self.mutation_schedulers.get(guild.id)
+        if scheduler is None:
+            scheduler = MutationScheduler(guild.id)
+            self.mutation_schedulers[guild.id] = scheduler
+        return scheduler
 
     def _tourney_start(self, ctx, tournament_id, api_key):
-        tourney = Tournament(ctx, tournament_id, api_key, self.session)
-        self.tournament_map[ctx.guild] = tourney
+        tourney = Tournament(ctx, tournament_id, api_key, self.transport,
+                             self._members(ctx.guild),
+                             self._mutations(ctx.guild),
+                             self.brackets.players(ctx.guild), self.journal,
+                             config.get('STREAM_MATCHES', False))
+        tourney.refresher = RefreshScheduler(functools.partial(
+            tourney.actor.run,
+            functools.partial(self._refresh_matches, tourney)))
+        self.brackets.add(ctx.channel.id, tourney)
         return tourney
 
-    async def _tourney_stop(self, guild):
-        tourney = self.tournament_map.pop(guild, None)
-        if tourney is None:
+    async def _tourney_stop(self, tourney):
+        if tourney is None or not self.brackets.remove(tourney):
             return
 
-        await tourney.delete_matches_category()
+        for match in tourney.called_matches.values():
+            tourney.unindex_match(match)
+        tourney.refresher.cancel()
+        tourney.poller.stop()
+        tourney.actor.close()
+        tourney.stop_background()
+        await asyncio.gather(
+            tourney.forget(),
+            tourney.delete_matches_category()
+        )
 
     async def _fix_missing(self, ctx, tourney):
         """How to deal with players missing Discord accounts."""
         missing = await tourney.missing_tags(ctx.author)
 
         while missing:
+            suggestions = tourney.suggest_members(missing)
             msg = [
                 'How do you want to proceed?',
                 '[1] Continue anyway',
                 '[2] DQ mismatched players',
                 '[3] Stop tourney creation',
-                'Respond with 1, 2, or 3.',
             ]
+            if suggestions:
+                msg.append('[4] Rename players to the suggested members:')
+                msg.extend(f'    {tag} -> {member.display_name}'
+                           for tag, member in suggestions.items())
+                msg.append('Respond with 1, 2, 3, or 4.')
+            else:
+                msg.append('Respond with 1, 2, or 3.')
             await utils.send_list(ctx.author, msg)
             msg = await self.bot.wait_for(
                     'message', check=self._is_dm_response(ctx.author))
@@ -120,23 +214,33 @@ class auTO(commands.Cog):
             if ret in {1, 2}:
                 await self.update_tags(ctx)
                 if ret == 2:
-                    await asyncio.gather(
-                            *(tourney.gar.dq(p) for p in missing))
+                    errors = await tourney.gar.bulk_dq(missing)
+                    await self._bulk_report(
+                        ctx.author, 'DQed', missing, errors)
                 return True
             if ret == 3:
                 return False
+            if ret == 4 and suggestions:
+                errors = await tourney.gar.bulk_rename(
+                    {tag: m.display_name for tag, m in suggestions.items()})
+                await self._bulk_report(
+                    ctx.author, 'Renamed', suggestions, errors)
+                missing = await tourney.missing_tags(ctx.author)
         return True
 
     @commands.command(**help['update_tags'])
     @has_tourney
     @is_to
+    @serialized
     # pylint: disable=unused-argument
     async def update_tags(self, ctx, *, tourney=None):
+        tourney.gar.invalidate('participants')
         await tourney.gar.get_raw()
 
     @commands.command(**help['rename'])
     @has_tourney
     @is_to
+    @serialized
     async def rename(self, ctx, challonge_tag: str, member: discord.Member,
                      *, tourney=None):
         await ctx.trigger_typing()
@@ -147,10 +251,95 @@ class auTO(commands.Cog):
             return
 
         match = tourney.find_match(challonge_tag)
-        match.update_player(challonge_tag, member)
+        if match is not None:
+            match.update_player(challonge_tag, member)
+            await tourney.save_match(match)
 
         await ctx.send(f'Renamed {challonge_tag} to {member.display_name}.')
 
+    @commands.command(**help['mass_rename'])
+    @has_tourney
+    @is_to
+    @serialized
+    async def mass_rename(self, ctx, *, mapping: str = '', tourney=None):
+        await ctx.trigger_typing()
+        lines = mapping.splitlines()
+        for attachment in ctx.message.attachments:
+            try:
+                text = (await attachment.read()).decode()
+            except UnicodeDecodeError:
+                await ctx.send(f"{attachment.filename} isn't a text file. "
+                               'Attach a UTF-8 file of one `TAG = @Player` '
+                               'per line.')
+                return
+            lines.extend(text.splitlines())
+
+        members = {}
+        unknown = []
+        for line in lines:
+            pair = re.match(r'\s*(.+?)\s*(?:=|->)\s*(.+?)\s*$', line)
+            if pair is None:
+                continue
+            tag, name = pair.groups()
+            member = self._find_member(ctx.guild, tourney, name)
+            if member is None:
+                unknown.append(f'{tag}: no member named {name}')
+            else:
+                members[tag] = member
+
+        if not members and not unknown:
+            await ctx.send('Nothing to rename. Send one `TAG = @Player` per '
+                           'line, or attach a file of them.')
+            return
+
+        errors = await tourney.gar.bulk_rename(
+            {tag: m.display_name for tag, m in members.items()})
+        for tag, member in members.items():
+            if tag in errors:
+                continue
+            match = tourney.find_match(tag)
+            if match is not None:
+                match.update_player(tag, member)
+                await tourney.save_match(match)
+
+        await self._bulk_report(ctx, 'Renamed', members, errors, unknown)
+
+    @commands.command(**help['mass_dq'])
+    @has_tourney
+    @is_to
+    @serialized
+    async def mass_dq(self, ctx, *players: Union[discord.Member, str],
+                      tourney=None):
+        if not players:
+            await ctx.send('Who should be DQed?')
+            return
+        await ctx.trigger_typing()
+        tags = [p.display_name if isinstance(p, discord.Member) else p
+                for p in players]
+        errors = await tourney.gar.bulk_dq(tags)
+        await self._bulk_report(ctx, 'DQed', tags, errors)
+        tourney.refresher.mark_dirty()
+
+    def _find_member(self, guild, tourney,
+                     name: str) -> Optional[discord.Member]:
+        mention = re.fullmatch(r'<@!?(\d+)>', name)
+        if mention is not None:
+            return guild.get_member(int(mention.group(1)))
+        return tourney.get_user(name)
+
+    async def _bulk_report(self, dest, verb: str, tags, errors: Dict[str, str],
+                           unknown: List[str] = ()):
+        """Tell |dest| how a bulk operation went."""
+        done = [tag for tag in tags if tag not in errors]
+        msg = [f'{verb} {len(done)} player(s).']
+        if done:
+            msg.append(', '.join(done))
+        if errors or unknown:
+            msg.append('Failed:')
+            msg.extend(f'- {tag}: {error}' for tag, error in errors.items())
+            msg.extend(f'- {line}' for line in unknown)
+        await utils.send_list(dest, msg)
+
     @commands.command(**help['status'])
     @has_tourney
     async def status(self, ctx, *, tourney=None):
@@ -187,8 +376,12 @@ class auTO(commands.Cog):
     async def _confirm(self, user, question) -> bool:
         """DM the user a yes/no question."""
         await user.send(f'{question} [Y/n]')
-        msg = await self.bot.wait_for(
-            'message', check=self._is_dm_response(user))
+        try:
+            msg = await self.bot.wait_for(
+                'message', check=self._is_dm_response(user),
+                timeout=CONFIRM_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
 
         return msg.content.strip().lower() in ['y', 'yes']
 
@@ -209,6 +402,11 @@ class auTO(commands.Cog):
 
     async def _create_tournament(self, ctx, url: str) -> Optional:
         tournament_id = challonge.extract_id(url)
+        if any(t.gar.tournament_id == tournament_id
+               for t in self.brackets.in_guild(ctx.guild)):
+            await ctx.send('That bracket is already running in another '
+                           'channel.')
+            raise ValueError
 
         key_error = ChallongeError('Invalid API Key')
 
@@ -242,7 +440,8 @@ class auTO(commands.Cog):
 
     @commands.command(**help['start'])
     async def start(self, ctx, url: str):
-        if self.tournament_map.get(ctx.guild) is not None:
+        tourney = await self.brackets.find(ctx.guild, ctx.channel)
+        if tourney is not None and tourney.has_channel(ctx.channel):
             await ctx.send('A tournament is already in progress')
             return
 
@@ -253,7 +452,8 @@ class auTO(commands.Cog):
             if str(e):
                 await ctx.send('Error starting tournament.')
         if tourney is None:
-            await self._tourney_stop(ctx.guild)
+            await self._tourney_stop(
+                self.brackets.in_channel(ctx.guild, ctx.channel.id))
             return
 
         activity = discord.Activity(name='Dolphin',
@@ -263,6 +463,7 @@ class auTO(commands.Cog):
             tourney.channel.trigger_typing()
         )
 
+        await tourney.save()
         name = await tourney.gar.get_name()
         url = await tourney.gar.get_url()
 
@@ -271,6 +472,7 @@ class auTO(commands.Cog):
         start_msg = await ctx.send(
             f'Starting {name}! Please stop your friendlies. {url}')
         await self.matches(ctx)
+        tourney.poller.start()
 
     @commands.command(**help['stop'])
     @has_tourney
@@ -279,7 +481,7 @@ class auTO(commands.Cog):
     async def stop(self, ctx, *, tourney=None):
         try:
             await asyncio.gather(
-                self._tourney_stop(ctx.guild),
+                self._tourney_stop(tourney),
                 self.bot.change_presence(),
                 ctx.send('Goodbye 😞')
             )
@@ -296,7 +498,7 @@ class auTO(commands.Cog):
         await tourney.unpin()
 
         try:
-            await tourney.gar.finalize()
+            await tourney.actor.run(tourney.gar.finalize)
         except ClientResponseError as e:
             if e.code != 422:
                 raise e
@@ -329,63 +531,112 @@ class auTO(commands.Cog):
 
         await asyncio.gather(
             utils.send_list(tourney.channel, message),
-            self._tourney_stop(tourney.guild),
             self.bot.change_presence(),
         )
+        # Not gathered, so it knows which task it's stopping from.
+        await self._tourney_stop(tourney)
 
     @commands.command(**help['matches'])
     @has_tourney
     # pylint: disable=unused-argument
     async def matches(self, ctx, *, tourney=None):
-        await tourney.channel.trigger_typing()
-        await asyncio.wait_for(self._load(), 2)
+        await tourney.refresher.refresh_now()
+
+    async def _refresh_matches(self, tourney):
+        """Call new matches.
+
+        Runs in the tournament's actor, so only the tournament's state is
+        changed here. The board and match channels are left to the
+        background, the finalize prompt to its own task.
+        """
         open_matches = await tourney.get_open_matches()
+        if not open_matches and tourney.gar.unconfirmed:
+            # Don't end the tournament on our own bookkeeping.
+            tourney.gar.invalidate('matches')
+            open_matches = await tourney.get_open_matches()
 
         if not open_matches:
-            await tourney.clean_up_channels(open_matches)
-            await tourney.channel.send('Tournament has finished!')
-            await self._end_tournament(tourney)
+            # Both the last report and the poller ask for a refresh.
+            if tourney.finishing is None or tourney.finishing.done():
+                tourney.finishing = asyncio.ensure_future(
+                    self._finish_tournament(tourney))
             return
 
-        await tourney.create_matches_category()
-        await tourney.clean_up_channels(open_matches)
+        # Matches reported on the Challonge site, or DQed.
+        open_ids = {m.id for m in open_matches}
+        await asyncio.gather(*(
+            tourney.close_match(match)
+            for match in list(tourney.called_matches.values())
+            if match.id not in open_ids))
 
         announcement = []
-        create_channels = []
+        pings = []
         for m in sorted(open_matches,
-                        key=lambda m: m['suggested_play_order']):
-            if m['id'] not in tourney.called_matches:
+                        key=lambda m: m.suggested_play_order):
+            if m.id not in tourney.called_matches:
                 match = Match(tourney, m)
-                tourney.called_matches[m['id']] = match
-
-            match = tourney.called_matches[m['id']]
-            if not match.channels:
-                create_channels.append(match.create_channels())
+                tourney.add_match(match)
+                await tourney.save_match(match)
 
-            round = f"**{m['round']}**: "
+            match = tourney.called_matches[m.id]
+            round = f'**{m.round}**: '
             # We want to only ping players the first time their match is
             # called.
             if match.first:
-                players = match.name(True)
+                pings.append(round + match.name(True))
                 match.first = False
-            else:
-                players = match.name()
 
-            if m['underway']:
+            players = match.name()
+            if m.underway:
                 players = f'*{players}*'
             announcement.append(round + players)
 
-        aws = await asyncio.gather(
-            utils.send_list(tourney.channel, announcement),
-            *create_channels
-        )
-
+        on_deck = tourney.gar.on_deck()
+        if on_deck:
+            announcement.extend(['', '__On deck__'])
+        for d in on_deck:
+            result = 'loser' if d.loser else 'winner'
+            announcement.append(
+                f'**{d.round}**: {d.waiting} vs {result} of '
+                f'{d.feeder.player1}/{d.feeder.player2}')
+
+        tourney.in_background(functools.partial(
+            self._show_matches, tourney, open_matches, announcement, pings))
+
+        if tourney.gar.unconfirmed:
+            # Matches were opened from reports, check them against Challonge.
+            tourney.gar.invalidate('matches')
+            tourney.refresher.mark_dirty()
+
+    async def _show_matches(self, tourney, open_matches, announcement,
+                            pings):
+        """Update the match board and set up the called matches' channels."""
+        await tourney.create_matches_category()
+        await tourney.clean_up_channels(open_matches)
         await asyncio.gather(
-            *(msg.delete() for msg in tourney.previous_match_msgs))
-        tourney.previous_match_msgs = aws[0]
+            tourney.board.update(announcement),
+            *(match.create_channels()
+              for match in list(tourney.called_matches.values())
+              if not match.channels))
+        if pings:
+            await tourney.board.ping(pings)
+
+    async def _finish_tournament(self, tourney):
+        """Announce the end after the queued board work, then ask to
+        finalize. The prompt stays out of the background queue so nothing
+        waits on the owner."""
+        await tourney.in_background(
+            functools.partial(self._announce_finish, tourney))
+        await self._end_tournament(tourney)
+
+    @staticmethod
+    async def _announce_finish(tourney):
+        await tourney.clean_up_channels([])
+        await tourney.channel.send('Tournament has finished!')
 
     @commands.command(**help['report'])
-    @has_tourney
+    @has_player_tourney
+    @serialized
     async def report(self, ctx, scores_csv: str, *, tourney=None,
                      username=None):
         await ctx.trigger_typing()
@@ -430,7 +681,7 @@ class auTO(commands.Cog):
             winner_id = match.player2_id
 
         await tourney.report_match(match, winner_id, username, scores_csv)
-        await self.matches(ctx)
+        tourney.refresher.mark_dirty()
 
     @commands.command(**help['bracket'])
     @has_tourney
@@ -441,6 +692,8 @@ class auTO(commands.Cog):
     @commands.command(**help['dq'])
     @has_tourney
     @is_to
+    @serialized
+    # pylint: disable=unused-argument
     async def dq(self, ctx, user: discord.Member, *, tourney=None):
         match = tourney.find_match(user.display_name)
         if match is None:
@@ -448,11 +701,12 @@ class auTO(commands.Cog):
                                        'match to be DQed from.')
             return
         await tourney.dq(user)
-        await self.matches(ctx)
+        tourney.refresher.mark_dirty()
 
     @commands.command(**help['noshow'])
     @has_tourney
     @is_to
+    # pylint: disable=unused-argument
     async def noshow(self, ctx, user: discord.Member, *, tourney=None):
         await tourney.channel.trigger_typing()
         match = tourney.find_match(user.display_name)
@@ -470,11 +724,34 @@ class auTO(commands.Cog):
                 'message', check=lambda m: m.author == user,
                 timeout=FIVE_MINUTES)
         except asyncio.TimeoutError:
-            await tourney.dq(user)
-            await self.matches(ctx)
+            await tourney.actor.run(functools.partial(tourney.dq, user))
+            tourney.refresher.mark_dirty()
+
+    @commands.command(**help['stats'])
+    @has_tourney
+    @is_to
+    async def stats(self, ctx, *, tourney=None):
+        guild = str(ctx.guild.id)
+        sections = [
+            ('Commands', metrics.COMMANDS.summary('command', guild=guild)),
+            ('Challonge API', metrics.CHALLONGE.summary(
+                'endpoint', tournament=tourney.gar.tournament_id)),
+            ('Discord API', metrics.DISCORD.summary('op', guild=guild)),
+        ]
+        message = []
+        for title, summary in sections:
+            message.append(f'**{title}**')
+            if not summary:
+                message.append('- none')
+            for name, (count, total) in sorted(summary.items()):
+                average = total / count * 1000
+                message.append(f'- {name}: {count} ({average:.0f}ms avg)')
+        await utils.send_list(ctx, message)
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx, err):
+        if ctx.command is not None:
+            metrics.COMMAND_ERRORS.inc(command=ctx.command.name)
         if isinstance(err, commands.CommandNotFound):
             # Reporting shorthand.
             msg = ctx.message.content.split()
@@ -496,32 +773,88 @@ class auTO(commands.Cog):
             return
         raise err
 
-    async def _load(self):
-        if not self.saved:
-            return
-        for guild in self.bot.guilds:
-            saved = self.saved.get(guild.id)
-            if not saved:
-                continue
-            try:
-                ctx = FakeContext(guild, saved)
-            except ValueError as e:
-                log.warning(e)
-                continue
-            tourney = self._tourney_start(
-                ctx, saved.tournament_id, saved.api_key)
-            if saved.category_id:
-                tourney.category = ctx.guild.get_channel(saved.category_id)
-            for id, mp in saved.matches.items():
-                match = mp.unpickle(tourney)
-                tourney.called_matches[id] = match
-        log.info('Loaded saved tournaments.')
-        self.saved = {}
+    def _load(self, guilds=None):
+        """Start restoring the saved tournaments of |guilds|."""
+        if guilds is None:
+            guilds = self.bot.guilds
+        self.brackets.load(guilds, self.saved)
 
     @commands.Cog.listener()
     async def on_ready(self):
         log.info('auTO has connected to Discord.')
-        await self._load()
+        if self.shard_ids and self.heartbeat is None:
+            self.heartbeat = asyncio.ensure_future(self._heartbeat())
+        self._load()
+        await self._serve()
+
+    async def _serve(self):
+        """Start the optional HTTP servers. Each worker listens on its own
+        port, counting up from the configured one."""
+        try:
+            port = config.get('METRICS_PORT')
+            if port and self.metrics_server is None:
+                self.metrics_server = await metrics.serve(port + self.worker)
+            port = config.get('STATUS_PORT')
+            if port and self.status_server.runner is None:
+                await self.status_server.start(
+                    port + self.worker, config.get('STATUS_HOST', '127.0.0.1'))
+        except OSError as e:
+            log.warning(f'Error starting HTTP server: {e}')
+
+    @commands.Cog.listener()
+    async def on_shard_ready(self, shard_id):
+        log.info(f'Shard {shard_id} is ready.')
+        self._load([g for g in self.bot.guilds if g.shard_id == shard_id])
+
+    async def _heartbeat(self):
+        """Keep our shard leases from going stale."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.journal.heartbeat(self.shard_ids)
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning(f'Error heartbeating: {e}')
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        index = self.member_indexes.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        index = self.member_indexes.get(member.guild.id)
+        if index is not None:
+            index.remove(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.display_name == after.display_name:
+            return
+        index = self.member_indexes.get(after.guild.id)
+        if index is not None:
+            index.update(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        """Username changes change the display name of un-nicked members."""
+        if before.name == after.name:
+            return
+        for index in self.member_indexes.values():
+            member = index.guild.get_member(after.id)
+            if member is not None:
+                index.update(member)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        # Before closing the scheduler, which cleaning up the channels uses.
+        await asyncio.gather(*(self._tourney_stop(tourney)
+                               for tourney in self.brackets.in_guild(guild)))
+        self.member_indexes.pop(guild.id, None)
+        self.brackets.forget_guild(guild)
+        scheduler = self.mutation_schedulers.pop(guild.id, None)
+        if scheduler is not None:
+            scheduler.close()
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -535,30 +868,14 @@ class auTO(commands.Cog):
             await self.bot.process_commands(message)
             return
 
-        tourney = self.tournament_map.get(message.guild)
-        if tourney is None:
-            return
-        if message.content == '!bracket':
-            await message.channel.send(await tourney.gar.get_url())
+        if message.content != '!bracket':
             return
-
-
-def load_tournaments():
-    saved = {}
-    try:
-        with open(PICKLE_FILE, 'rb') as f:
-            saved = pickle.load(f)
-    except OSError:
-        pass
-    except Exception as e: # pylint: disable=broad-except
-        log.warning(f'Error unpickling: {e}')
-
-    try:
-        os.remove(PICKLE_FILE)
-    except OSError:
-        pass
-
-    return saved
+        tourney = await self.brackets.find(message.guild, message.channel)
+        tourneys = ([tourney] if tourney is not None else
+                    self.brackets.in_guild(message.guild))
+        urls = await asyncio.gather(*(t.gar.get_url() for t in tourneys))
+        if urls:
+            await message.channel.send('\n'.join(urls))
 
 
 def setup_logging():
@@ -580,12 +897,20 @@ def setup_logging():
             logger.addHandler(handler)
 
 
-class Bot(commands.Bot):
+class BotMixin():
     async def close(self):
         await self.get_cog('auTO').close()
         await super().close()
 
 
+class Bot(BotMixin, commands.Bot):
+    pass
+
+
+class ShardedBot(BotMixin, commands.AutoShardedBot):
+    """Runs a subset of the shards, alongside other worker processes."""
+
+
 def iprefix(bot, msg):
     """Make prefix case insensitive and respond to @mentions."""
     prefixes = []
@@ -604,19 +929,72 @@ def iprefix(bot, msg):
     return commands.when_mentioned_or(*prefixes)(bot, msg)
 
 
-def main():
-    saved = load_tournaments()
-    setup_logging()
+def run_bot(journal, saved, shard_ids=None, shard_count=None, worker=0):
     github = 'https://github.com/mtimkovich/auTO#running-a-tournament'
     intents = discord.Intents.default()
     intents.members = True
-    bot = Bot(command_prefix=iprefix,
-              description=github,
-              intents=intents,
-              case_insensitive=True)
-    bot.add_cog(auTO(bot, saved))
+    kwargs = {
+        'command_prefix': iprefix,
+        'description': github,
+        'intents': intents,
+        'case_insensitive': True,
+    }
+    if shard_ids is None:
+        bot = Bot(**kwargs)
+    else:
+        bot = ShardedBot(shard_ids=shard_ids, shard_count=shard_count,
+                         **kwargs)
+    bot.add_cog(auTO(bot, saved, journal, worker))
     bot.run(config.get('DISCORD_TOKEN'))
 
 
+def run_worker(worker, shard_ids, shard_count):
+    journal = Journal()
+    journal.claim_shards(shard_ids)
+    log.info(f'Running shards {shard_ids}.')
+    run_bot(journal, journal.load(), shard_ids, shard_count, worker)
+
+
+def run_workers(shard_count: int, workers: int):
+    """Split the shards between worker processes.
+
+    Tournament state and API keys live in the journal, which every worker
+    shares, so a guild can move to another worker when the split changes.
+    """
+    processes = [
+        multiprocessing.Process(
+            target=run_worker, name=f'auTO-{i}',
+            args=(i, list(range(i, shard_count, workers)), shard_count))
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    finally:
+        # Workers save their state and release their shards on SIGTERM.
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        for p in processes:
+            p.join()
+
+
+def main():
+    journal = Journal()
+    saved = load_tournaments(journal)
+    setup_logging()
+
+    shard_count = config.get('SHARD_COUNT')
+    if shard_count:
+        journal.close()
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        run_workers(shard_count, min(config.get('WORKERS', 1), shard_count))
+        return
+
+    run_bot(journal, saved)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,70 @@
+"""The live match board."""
+import asyncio
+import logging
+from typing import List
+
+import discord
+
+from . import metrics
+from . import utils
+
+log = logging.getLogger(__name__)
+
+
+class LiveBoard():
+    """Match list that's edited in place instead of being reposted.
+
+    Only messages whose contents changed are edited. Messages are only sent
+    or deleted when the list needs more or fewer of them.
+    """
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+        self.messages = []
+        self.contents = []
+        self.ping_msgs = []
+
+    async def update(self, lines: List[str]):
+        chunks = utils.chunk_lines(lines)
+        try:
+            await asyncio.gather(*(
+                self._timed('message_edit', msg.edit(content=chunk))
+                for msg, old, chunk in zip(self.messages, self.contents,
+                                           chunks)
+                if old != chunk))
+        except discord.NotFound:
+            # Someone deleted part of the board. Start over.
+            log.warning('Match board message is missing, reposting.')
+            await self.clear()
+
+        for chunk in chunks[len(self.messages):]:
+            self.messages.append(await self._timed(
+                'message_send', self.channel.send(chunk)))
+
+        extra = self.messages[len(chunks):]
+        self.messages = self.messages[:len(chunks)]
+        self.contents = chunks
+        await self._delete(extra)
+
+    async def ping(self, lines: List[str]):
+        """Notify players in a separate message, since edits don't ping."""
+        old = self.ping_msgs
+        self.ping_msgs = await self._timed(
+            'message_send', utils.send_list(self.channel, lines))
+        await self._delete(old)
+
+    async def clear(self):
+        msgs = self.messages
+        self.messages = []
+        self.contents = []
+        await self._delete(msgs)
+
+    async def _timed(self, op: str, aw):
+        return await metrics.DISCORD.timed(
+            aw, op=op, guild=str(self.channel.guild.id))
+
+    async def _delete(self, msgs):
+        try:
+            await asyncio.gather(*(self._timed('message_delete', msg.delete())
+                                   for msg in msgs))
+        except discord.HTTPException as e:
+            log.warning(e)
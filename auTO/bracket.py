@@ -0,0 +1,98 @@
+"""The shape of a bracket: which match feeds into which."""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from .records import MatchRecord
+
+
+class Edge(NamedTuple):
+    """Where a player goes after a match."""
+    match_id: int
+    # 1 or 2, the player slot they take in the next match.
+    slot: int
+    loser: bool
+
+
+class OnDeck(NamedTuple):
+    """A match that's waiting on one player."""
+    match: MatchRecord
+    round: str
+    waiting: str
+    # The open match deciding the other player.
+    feeder: MatchRecord
+    loser: bool
+
+
+class BracketGraph():
+    """Matches linked through Challonge's prerequisite match ids.
+
+    The structure of a bracket doesn't change once it's started, so this is
+    built once and round labels are worked out up front. Finding where a
+    player goes next is then a dict lookup.
+    """
+    def __init__(self, records: Iterable[MatchRecord],
+                 round_name: Callable[[int], str]):
+        self.labels = {}
+        # match id -> [winner's edge, loser's edge], either can be None.
+        self.edges = {}
+        records = list(records)
+        for m in records:
+            self.labels[m.id] = round_name(m.round_num)
+            self.edges[m.id] = [None, None]
+
+        for m in records:
+            for slot, prereq, loser in (
+                    (1, m.player1_prereq_match_id,
+                     m.player1_is_prereq_match_loser),
+                    (2, m.player2_prereq_match_id,
+                     m.player2_is_prereq_match_loser)):
+                if prereq in self.edges:
+                    self.edges[prereq][bool(loser)] = Edge(m.id, slot,
+                                                           bool(loser))
+
+    def covers(self, records: List[MatchRecord]) -> bool:
+        """Whether this graph was built from the same set of matches."""
+        return (len(records) == len(self.labels) and
+                all(m.id in self.labels for m in records))
+
+    def label(self, match_id: int) -> str:
+        return self.labels[match_id]
+
+    def next_match(self, match_id: int, won: bool) -> Optional[Edge]:
+        """Where the winner (or loser) of |match_id| plays next."""
+        edges = self.edges.get(match_id)
+        if edges is None:
+            return None
+        return edges[not won]
+
+    def unlocks(self, match_id: int,
+                matches: Dict[int, MatchRecord]) -> List[MatchRecord]:
+        """Matches that open once |match_id| is reported, because their other
+        player is already waiting."""
+        return [matches[edge.match_id]
+                for edge, _ in self._waiting(match_id, matches)]
+
+    def on_deck(self, matches: Dict[int, MatchRecord],
+                player_map: Dict[int, str]) -> List[OnDeck]:
+        """Pending matches that are one report away from opening, in the
+        order they should be played."""
+        on_deck = []
+        for feeder in matches.values():
+            if feeder.state != 'open':
+                continue
+            for edge, waiting in self._waiting(feeder.id, matches):
+                on_deck.append(OnDeck(
+                    matches[edge.match_id], self.labels[edge.match_id],
+                    player_map[waiting], feeder, edge.loser))
+        on_deck.sort(key=lambda d: d.match.suggested_play_order or 0)
+        return on_deck
+
+    def _waiting(self, match_id: int, matches: Dict[int, MatchRecord]):
+        """(edge, id of the player already there) for each pending match
+        that |match_id| feeds into."""
+        for edge in self.edges.get(match_id, ()):
+            if edge is None:
+                continue
+            m = matches[edge.match_id]
+            waiting = m.player2_id if edge.slot == 1 else m.player1_id
+            if m.state == 'pending' and waiting is not None:
+                yield edge, waiting
@@ -0,0 +1,219 @@
+"""The tournaments running in each guild, and restoring them on startup."""
+import asyncio
+import functools
+import logging
+import os
+import pickle
+from typing import Callable, List, Optional
+
+from .tournament import FakeContext, PlayerIndex, Tournament
+
+PICKLE_FILE = 'auTO.pickle'
+log = logging.getLogger(__name__)
+
+
+def has_tourney(func):
+    """Decorator that returns if no tourney is set."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        ctx = args[0]
+        tourney = await self.brackets.find(ctx.guild, ctx.channel)
+        if tourney is None:
+            await self.no_tourney(ctx)
+            return
+        kwargs['tourney'] = tourney
+        return await func(self, *args, **kwargs)
+    return wrapper
+
+
+def has_player_tourney(func):
+    """Like has_tourney, but finds the tournament the player has a called
+    match in, whichever channel the command was sent from."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        ctx = args[0]
+        username = kwargs.get('username') or ctx.author.display_name
+        tourney = await self.brackets.find_player(
+            ctx.guild, ctx.channel, username)
+        if tourney is None:
+            await self.no_tourney(ctx, username)
+            return
+        kwargs['tourney'] = tourney
+        return await func(self, *args, **kwargs)
+    return wrapper
+
+
+class Brackets():
+    """Every running tournament, by guild and the channel it's run from.
+
+    |start| starts a tournament from a context, tournament id and API key,
+    and is used to restore the saved ones from |journal|.
+    """
+    def __init__(self, start: Callable[..., Tournament], journal):
+        self.start = start
+        self.journal = journal
+        # Guild -> channel id -> the tournament run from that channel.
+        self.tournaments = {}
+        # Guild id -> event set once its saved tournaments are restored.
+        self.restoring = {}
+        self.player_indexes = {}
+
+    def all(self) -> List[Tournament]:
+        """Every running tournament."""
+        return [tourney for tourneys in self.tournaments.values()
+                for tourney in tourneys.values()]
+
+    def in_guild(self, guild) -> List[Tournament]:
+        return list(self.tournaments.get(guild, {}).values())
+
+    def in_channel(self, guild, channel_id) -> Optional[Tournament]:
+        """The tournament started from the channel, not its match channels."""
+        return self.tournaments.get(guild, {}).get(channel_id)
+
+    def players(self, guild) -> PlayerIndex:
+        index = self.player_indexes.get(guild.id)
+        if index is None:
+            index = PlayerIndex()
+            self.player_indexes[guild.id] = index
+        return index
+
+    def add(self, channel_id, tourney):
+        self.tournaments.setdefault(tourney.guild, {})[channel_id] = tourney
+
+    def remove(self, tourney) -> bool:
+        """Forget |tourney|. False if it wasn't running."""
+        tourneys = self.tournaments.get(tourney.guild, {})
+        if tourneys.get(tourney.channel.id) is not tourney:
+            return False
+        del tourneys[tourney.channel.id]
+        if not tourneys:
+            del self.tournaments[tourney.guild]
+        return True
+
+    def forget_guild(self, guild):
+        self.player_indexes.pop(guild.id, None)
+
+    async def find(self, guild, channel=None) -> Optional[Tournament]:
+        """The tournament run from |channel| or one of its match channels,
+        once the guild is done restoring. If the guild only runs one, that
+        one."""
+        if guild is None:
+            # Direct messages.
+            return None
+        restored = self.restoring.get(guild.id)
+        if restored is not None:
+            await restored.wait()
+        tourneys = self.in_guild(guild)
+        for tourney in tourneys:
+            if channel is not None and tourney.has_channel(channel):
+                return tourney
+        if len(tourneys) == 1:
+            return tourneys[0]
+        return None
+
+    async def find_player(self, guild, channel,
+                          username) -> Optional[Tournament]:
+        """The tournament |username| has a called match in. The channel's
+        tournament wins if they have one in several."""
+        tourney = await self.find(guild, channel)
+        if guild is None:
+            return None
+        called = self.players(guild).find(username)
+        if not called or tourney in called:
+            return tourney
+        if len(called) == 1:
+            return called[0]
+        return None
+
+    def is_ambiguous(self, guild, username=None) -> bool:
+        """Whether several tournaments running is why none was found, rather
+        than there being none or |username| not being in any of them."""
+        if guild is None or not self.tournaments.get(guild):
+            return False
+        return username is None or bool(self.players(guild).find(username))
+
+    def load(self, guilds, saved):
+        """Start restoring the tournaments |saved| for each of |guilds|.
+
+        Each guild is restored concurrently in the background. Lookups for
+        a guild wait for its restore to finish.
+        """
+        for guild in guilds:
+            guild_saved = saved.pop(guild.id, None)
+            if not guild_saved:
+                continue
+            self.restoring[guild.id] = asyncio.Event()
+            asyncio.ensure_future(self._restore_guild(guild, guild_saved))
+
+    async def _restore_guild(self, guild, saved):
+        """Restore the guild's tournaments, then warm up their brackets
+        concurrently. Lookups don't wait for the warm up.
+
+        Tournaments whose channel or owner is gone are deleted from the
+        journal, so they aren't tried again on every restart.
+        """
+        tourneys = []
+        gone = []
+        try:
+            for s in saved:
+                try:
+                    ctx = FakeContext(guild, s)
+                except ValueError as e:
+                    log.warning(f'Forgetting tournament {s.tournament_id} in '
+                                f'{guild.name}, {e}.')
+                    gone.append(s.tournament_id)
+                    continue
+                tourney = self._restore(ctx, s)
+                if tourney is not None:
+                    tourneys.append(tourney)
+        finally:
+            self.restoring.pop(guild.id).set()
+        await asyncio.gather(
+            *(self.journal.delete_tournament(guild.id, tournament_id)
+              for tournament_id in gone),
+            # So the first commands don't have to fetch the bracket.
+            *(self._warm_up(t) for t in tourneys))
+
+    def _restore(self, ctx, saved) -> Optional[Tournament]:
+        guild = ctx.guild
+        try:
+            tourney = self.start(ctx, saved.tournament_id, saved.api_key)
+            if saved.category_id:
+                tourney.category = ctx.guild.get_channel(saved.category_id)
+            for mp in saved.matches.values():
+                tourney.add_match(mp.unpickle(tourney))
+            tourney.poller.start()
+            log.info(f'Restored tournament {saved.tournament_id} in '
+                     f'{guild.name}.')
+            return tourney
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning(f'Error restoring tournament in {guild.name}: {e}')
+            return None
+
+    @staticmethod
+    async def _warm_up(tourney):
+        try:
+            await tourney.gar.get_raw()
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning(f'Error fetching {tourney.gar.tournament_id}: {e}')
+
+
+def load_tournaments(journal):
+    """Load saved tournaments, importing the pickle older versions wrote."""
+    saved = {}
+    try:
+        with open(PICKLE_FILE, 'rb') as f:
+            saved = pickle.load(f)
+    except OSError:
+        pass
+    except Exception as e: # pylint: disable=broad-except
+        log.warning(f'Error unpickling: {e}')
+
+    if saved:
+        journal.import_saved(saved)
+    try:
+        os.remove(PICKLE_FILE)
+    except OSError:
+        pass
+
+    return journal.load()
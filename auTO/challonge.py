@@ -2,26 +2,58 @@
 import asyncio
 import collections
 import functools
+import hashlib
 import os
+import logging
 import re
-from typing import Optional, List
+import time
+from typing import Dict, Iterable, List, Optional
 
 import aiohttp
 from aiohttp.client_exceptions import ClientResponseError
 
-from . import utils
+from .bracket import BracketGraph, OnDeck
+from . import decode
+from . import metrics
+from . import ratelimit
+from .records import BracketInfo, MatchRecord, Participant
+from .transport import LiveTransport, Response, Transport, read_body
+
+log = logging.getLogger(__name__)
 
 BASE_CHALLONGE_API_URL = 'https://api.challonge.com/v1/tournaments'
 URLS = {
-    'tournament': os.path.join(BASE_CHALLONGE_API_URL, '{}.json'),
-    'participants': os.path.join(
-        BASE_CHALLONGE_API_URL, '{}', 'participants.json'),
-    'matches': os.path.join(BASE_CHALLONGE_API_URL, '{}', 'matches.json'),
+    'tournament': '{base}/{id}.json',
+    'participants': '{base}/{id}/participants.json',
+    'matches': '{base}/{id}/matches.json',
+}
+
+MATCH_URL = '{base}/{id}/matches/{match_id}'
+PARTICIPANT_URL = '{base}/{id}/participants/{participant_id}.json'
+ACTION_URL = '{base}/{id}/{action}.json'
+
+# Requests per second allowed for each API key, and how far we can burst.
+RATE_LIMIT = 5
+RATE_BURST = 10
+MAX_ATTEMPTS = 4
+# Methods that are safe to retry after a server error.
+IDEMPOTENT = {'GET', 'PUT', 'DELETE'}
+# Participant updates in flight at once during bulk operations.
+BULK_CONCURRENCY = 3
+
+# Seconds each resource is served from the cache before it's refetched.
+# None keeps it until something we do changes it.
+TTLS = {
+    'tournament': 300,
+    'participants': None,
+    'matches': 2,
 }
 
-MATCH_URL = os.path.join(BASE_CHALLONGE_API_URL, '{}', 'matches', '{}')
-PARTICIPANT_URL = os.path.join(
-        BASE_CHALLONGE_API_URL, '{}', 'participants', '{}.json')
+# Bytes read at a time when streaming matches.
+STREAM_CHUNK = 64 * 1024
+
+# Shared by every tournament using the same API key.
+_buckets = {}
 
 
 def extract_id(url):
@@ -38,64 +70,329 @@ def extract_id(url):
     return f'{subdomain}-{tourney}'
 
 
-def raw_dict(func):
-    """Erect the raw_dict if it's not already up."""
+def loaded(func):
+    """Fetch the tournament if we haven't yet."""
     @functools.wraps(func)
     async def wrapper(self, *args, **kwargs):
-        if self.raw_dict is None:
+        if self.info is None:
             await self.get_raw()
         return await func(self, *args, **kwargs)
     return wrapper
 
 
+class Snapshot():
+    """The last response we've seen for a resource.
+
+    Lets us make conditional requests and skip parsing payloads that haven't
+    changed since the last fetch. Only the parsed records are kept, not the
+    payload itself.
+    """
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.data = None
+        # Bumped every time the payload actually changes.
+        self.version = 0
+        self.fetched_at = None
+        # Bumped every time the cached payload is invalidated.
+        self.generation = 0
+        # Whether |data| has changes of ours Challonge hasn't shown us yet.
+        self.local = False
+
+    def fresh(self, ttl: Optional[float]) -> bool:
+        if self.data is None or self.fetched_at is None:
+            return False
+        return ttl is None or time.monotonic() - self.fetched_at < ttl
+
+    def invalidate(self):
+        self.fetched_at = None
+        self.generation += 1
+
+    def modify(self):
+        """Note that |data| was changed here, ahead of Challonge. The next
+        response is parsed in full, whatever it is."""
+        self.etag = self.last_modified = self.digest = None
+        self.version += 1
+        self.local = True
+
+    def headers(self) -> dict:
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def update(self, digest: bytes, headers, parse) -> bool:
+        """Store a response whose body hashes to |digest|. |parse| is only
+        called if the payload changed. Returns whether it did."""
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+        self.local = False
+
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        self.data = parse()
+        self.version += 1
+        return True
+
+
+def _hasher(body: bytes = b''):
+    return hashlib.blake2b(body, digest_size=16)
+
+
+def _bucket(api_key: str) -> ratelimit.TokenBucket:
+    # Keyed by a hash, so keys aren't kept after their tournaments end.
+    key = hashlib.sha256(api_key.encode()).digest()
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = ratelimit.TokenBucket(RATE_LIMIT, RATE_BURST)
+        _buckets[key] = bucket
+    return bucket
+
+
+def _should_retry(method: str, status: Optional[int]) -> bool:
+    """Throttled requests were never applied, so they're always retried."""
+    if status == 429:
+        return True
+    if method not in IDEMPOTENT:
+        return False
+    return status is None or status >= 500
+
+
 class Challonge():
-    def __init__(self, api_key, tournament_id, session):
+    """Challonge client for a single tournament.
+
+    |loads| decodes response bodies, orjson by default if it's installed.
+    With |stream_matches|, the match list is parsed as it downloads instead
+    of after, so the body, its decoded list and the records aren't all in
+    memory at once. Unchanged match lists are then only skipped if
+    Challonge answers with a 304. |ttls| overrides how long resources are
+    cached, see `TTLS`. Writes invalidate or patch the resources they
+    change.
+    """
+    def __init__(self, api_key, tournament_id, transport: Transport,
+                 base_url=BASE_CHALLONGE_API_URL, loads=None,
+                 stream_matches=False, ttls=None):
         self.api_key = api_key
         self.api_key_dict = {'api_key': self.api_key}
         self.tournament_id = tournament_id
-        self.session = session
+        self.transport = transport
+        self.base_url = base_url
+        self.bucket = _bucket(api_key)
+        self.loads = loads or decode.default_loads()
+        self.stream_matches = stream_matches
+        self.ttls = dict(TTLS, **(ttls or {}))
+        # In-flight GETs, so identical concurrent requests share one.
+        self._inflight = {}
         self.losers_rounds = None
         self.winners_rounds = None
 
         self.player_map = None
-        self.raw_dict = None
+        # Lowercased tag -> participant, for looking players up by tag.
+        self.participants = {}
+        self.snapshots = collections.defaultdict(Snapshot)
+        self.parsers = {
+            'tournament': BracketInfo.from_json,
+            'participants': self._parse_participants,
+            'matches': self._parse_matches,
+        }
+
+        # Built once the matches are known, see `get_matches`.
+        self.graph = None
+        # Matches with both players known, as of `_matches_version`.
+        self._matches = None
+        self._matches_version = None
+        # Every match by id, including ones still waiting on players.
+        self._match_index = {}
+        # The matches snapshot version `_match_index` was built from.
+        self._index_version = None
+
+    @property
+    def info(self) -> Optional[BracketInfo]:
+        return self.snapshots['tournament'].data
+
+    @property
+    def players(self) -> List[Participant]:
+        return self.snapshots['participants'].data or []
+
+    @property
+    def matches(self) -> List[MatchRecord]:
+        """Matches with both players known, as of the last `get_matches`."""
+        return list(self._matches or ())
+
+    @property
+    def unconfirmed(self) -> bool:
+        """Whether the cached matches were advanced by reports Challonge
+        hasn't shown us yet."""
+        return self.snapshots['matches'].local
 
     async def get_raw(self):
-        self.raw_dict = {}
+        participants = self.snapshots['participants']
+        version = participants.version
 
         await asyncio.gather(*(self.update_data(key) for key in URLS))
 
-        self._set_player_map()
-        self._max_rounds()
+        if self.player_map is None or version != participants.version:
+            self._set_player_map()
+        if self._max_rounds():
+            # Round labels depend on the bounds.
+            self.graph = None
+            self._clear_matches()
 
-        return self.raw_dict
+    def _url(self, template: str, **kwargs) -> str:
+        return template.format(base=self.base_url, id=self.tournament_id,
+                               **kwargs)
 
-    async def update_data(self, key):
-        url = URLS[key].format(self.tournament_id)
-        async with self.session.get(url, params=self.api_key_dict) as resp:
-            data = await resp.json()
-            self.raw_dict[key] = data
+    async def _request(self, method: str, url: str, endpoint: str,
+                       read=read_body, **kwargs) -> Response:
+        """Make a rate limited request, retrying throttling and errors.
 
-            return data
+        The response body is whatever |read| makes of the response.
+        """
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            start = time.perf_counter()
+            status = None
+            try:
+                resp = await self.transport.request(method, url, read,
+                                                    **kwargs)
+                status = resp.status
+                return resp
+            except ClientResponseError as e:
+                error, status, headers = e, e.status, e.headers
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error, status, headers = e, None, None
+            finally:
+                metrics.CHALLONGE.observe(
+                    time.perf_counter() - start, method=method,
+                    endpoint=endpoint, status=str(status),
+                    tournament=self.tournament_id)
+
+            attempt += 1
+            if attempt == MAX_ATTEMPTS or not _should_retry(method, status):
+                raise error
+            delay = (ratelimit.retry_after(headers) or
+                     ratelimit.backoff(attempt))
+            log.info(f'Retrying {method} {url} in {delay:.1f}s ({error}).')
+            await asyncio.sleep(delay)
+
+    async def _get(self, url: str, endpoint: str, headers=None,
+                   read=read_body) -> Response:
+        """GET |url|, sharing the response with identical in-flight GETs."""
+        key = (url, tuple(sorted((headers or {}).items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(
+                'GET', url, endpoint, read, params=self.api_key_dict,
+                headers=headers))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.get(key) is t and
+                                   self._inflight.pop(key))
+        return await asyncio.shield(task)
+
+    async def _send(self, method: str, url: str, endpoint: str, data=None):
+        """Make a write request and decode the response."""
+        if data is None:
+            data = self.api_key_dict
+        resp = await self._request(method, url, endpoint, data=data)
+        return self.loads(resp.body) if resp.body.strip() else None
+
+    def invalidate(self, *keys: str):
+        """Make the next read of each resource in |keys| go to Challonge."""
+        for key in keys:
+            self.snapshots[key].invalidate()
+            # Requests already in flight may not see our changes.
+            url = self._url(URLS[key])
+            for inflight in [k for k in self._inflight if k[0] == url]:
+                del self._inflight[inflight]
 
-    @raw_dict
+    async def update_data(self, key):
+        """Fetch a resource, unless the cached one is still fresh. Reuses the
+        last payload if it hasn't changed."""
+        url = self._url(URLS[key])
+        snapshot = self.snapshots[key]
+        if snapshot.fresh(self.ttls[key]):
+            return snapshot.data
+
+        generation = snapshot.generation
+        if key == 'matches' and self.stream_matches:
+            resp = await self._get(url, key, snapshot.headers(),
+                                   self._stream_matches)
+            if resp.status != 304:
+                digest, records = resp.body
+                snapshot.update(digest, resp.headers, lambda: records)
+        else:
+            resp = await self._get(url, key, snapshot.headers())
+            if resp.status != 304:
+                body = resp.body
+                snapshot.update(_hasher(body).digest(), resp.headers,
+                                lambda: self.parsers[key](self.loads(body)))
+        if snapshot.generation == generation:
+            snapshot.fetched_at = time.monotonic()
+        return snapshot.data
+
+    async def _stream_matches(self, r: aiohttp.ClientResponse):
+        """Parse matches into records as the response comes in.
+
+        The digest is only known once the whole body is in, so unlike
+        buffered responses, an unchanged payload without an ETag is decoded
+        anyway. Records whose `updated_at` didn't move are still reused.
+        """
+        if r.status == 304:
+            return None
+        old = self._old_matches()
+        digest = _hasher()
+        decoder = decode.ArrayDecoder()
+        records = []
+        async for chunk in r.content.iter_chunked(STREAM_CHUNK):
+            digest.update(chunk)
+            records.extend(self._match_record(m, old)
+                           for m in decoder.feed(chunk))
+        decoder.close()
+        return digest.digest(), records
+
+    def _parse_participants(self, data) -> List[Participant]:
+        return [Participant.from_json(p) for p in data]
+
+    def _parse_matches(self, data) -> List[MatchRecord]:
+        old = self._old_matches()
+        return [self._match_record(m, old) for m in data]
+
+    def _old_matches(self) -> Dict[int, MatchRecord]:
+        return {m.id: m for m in self.snapshots['matches'].data or ()}
+
+    def _match_record(self, m, old: Dict[int, MatchRecord]) -> MatchRecord:
+        """Only matches whose `updated_at` moved are parsed again, the rest
+        keep their old record."""
+        record = old.get(m['match']['id'])
+        if (record is None or record.updated_at is None or
+                record.updated_at != m['match'].get('updated_at')):
+            record = MatchRecord.from_json(m)
+        return record
+
+    @loaded
     async def get_url(self) -> str:
-        return self.raw_dict['tournament']['tournament']['full_challonge_url']
+        return self.info.url
 
-    @raw_dict
+    @loaded
     async def get_name(self) -> str:
-        return self.raw_dict['tournament']['tournament']['name'].strip()
+        return self.info.name
 
     def get_state(self) -> str:
-        return self.raw_dict['tournament']['tournament']['state']
+        return self.info.state
 
     def _is_elimination(self) -> bool:
-        return (self.raw_dict['tournament']['tournament']['tournament_type']
-                .endswith('elimination'))
+        return self.info.is_elimination()
 
-    def _max_rounds(self):
-        for match in self.raw_dict['matches']:
-            round_num = match['match']['round']
+    def _max_rounds(self) -> bool:
+        """Find the bounds of the bracket. Returns whether they changed."""
+        bounds = (self.losers_rounds, self.winners_rounds)
+        for match in self.snapshots['matches'].data:
+            round_num = match.round_num
             if self.losers_rounds is None or self.winners_rounds is None:
                 self.losers_rounds = round_num
                 self.winners_rounds = round_num
@@ -103,6 +400,7 @@ class Challonge():
 
             self.losers_rounds = min(self.losers_rounds, round_num)
             self.winners_rounds = max(self.winners_rounds, round_num)
+        return bounds != (self.losers_rounds, self.winners_rounds)
 
     def round_name(self, round_num: int) -> str:
         """Creates the shortened, human-readable version of round names."""
@@ -132,146 +430,210 @@ class Challonge():
         code checks for both.
         """
         self.player_map = {}
-        for p in self.raw_dict['participants']:
-            if p['participant'].get('name'):
-                player_name = p['participant']['name'].strip()
-            else:
-                player_name = p['participant'].get(
-                    'username', '<unknown>').strip()
-            self.player_map[p['participant'].get('id')] = player_name
-            if p['participant'].get('group_player_ids'):
-                for gpid in p['participant']['group_player_ids']:
-                    self.player_map[gpid] = player_name
-
-    @raw_dict
+        self.participants = {}
+        for p in self.players:
+            self.player_map[p.id] = p.name
+            self.participants.setdefault(p.name.lower(), p)
+            for gpid in p.group_player_ids:
+                self.player_map[gpid] = p.name
+        # Match records hold player names, so they're stale now.
+        self._clear_matches()
+
+    def _clear_matches(self):
+        self._matches = None
+        self._matches_version = None
+
+    @loaded
     async def progress_meter(self) -> int:
         tournament = await self.update_data('tournament')
-        return tournament['tournament']['progress_meter']
+        return tournament.progress_meter
 
     async def report_match(self, match_id: int, winner_id: int,
                            scores: str) -> str:
-        url = MATCH_URL.format(self.tournament_id, match_id) + '.json'
+        url = self._url(MATCH_URL, match_id=match_id) + '.json'
         data = self.api_key_dict.copy()
         data['match[winner_id]'] = winner_id
         data['match[scores_csv]'] = scores
 
-        async with self.session.put(url, data=data) as r:
-            return await r.json()
+        advanced = False
+        try:
+            resp = await self._send('PUT', url, 'report', data)
+            advanced = self._advance(match_id, resp)
+            return resp
+        finally:
+            self.invalidate('tournament')
+            if not advanced:
+                self.invalidate('matches')
+
+    def _advance(self, match_id: int, resp) -> bool:
+        """Apply a report to the cached matches, moving its players into the
+        matches they play next. Returns whether it could.
+
+        Saves fetching the whole match list to find the one or two matches a
+        report opens. The next fetch replaces whatever we got wrong, like
+        forfeits against DQed players.
+        """
+        match = self._match_index.get(match_id)
+        snapshot = self.snapshots['matches']
+        if (match is None or self._index_version != snapshot.version or
+                not isinstance(resp, dict) or 'match' not in resp):
+            return False
+        reported = MatchRecord.from_json(resp)
+        if reported.state != 'complete' or reported.winner_id is None:
+            return False
+        edges = [e for e in self.graph.edges.get(match_id, ()) if e]
+        if len({e.match_id for e in edges}) < len(edges):
+            # Grand finals, only Challonge knows if there's a reset.
+            return False
+        for edge in edges:
+            target = self._match_index[edge.match_id]
+            other = (target.player2_prereq_match_id if edge.slot == 1
+                     else target.player1_prereq_match_id)
+            if other is not None and (other not in self._match_index or
+                                      other not in self.graph.edges):
+                # Fed by a bye Challonge hides, which it may skip past.
+                return False
+
+        match.state = reported.state
+        match.winner_id = reported.winner_id
+        match.loser_id = reported.loser_id
+        match.updated_at = reported.updated_at
+        match.resolved = None
+        for edge in edges:
+            target = self._match_index[edge.match_id]
+            player = match.loser_id if edge.loser else match.winner_id
+            setattr(target, f'player{edge.slot}_id', player)
+            if (target.state == 'pending' and
+                    target.player1_id is not None and
+                    target.player2_id is not None):
+                target.state = 'open'
+            # So the next fetch parses it again.
+            target.updated_at = None
+            target.resolved = None
+
+        snapshot.modify()
+        self._index_version = snapshot.version
+        return True
 
     async def mark_underway(self, match_id: int) -> str:
-        url = os.path.join(MATCH_URL.format(self.tournament_id, match_id),
-                           'mark_as_underway.json')
-        async with self.session.post(url, data=self.api_key_dict) as r:
-            return await r.json()
+        url = (self._url(MATCH_URL, match_id=match_id) +
+               '/mark_as_underway.json')
+        resp = await self._send('POST', url, 'mark_underway')
+        match = self._match_index.get(match_id)
+        if match is not None:
+            match.underway = True
+        return resp
 
     async def finalize(self) -> str:
-        url = os.path.join(BASE_CHALLONGE_API_URL, self.tournament_id,
-                           'finalize.json')
-        async with self.session.post(url, data=self.api_key_dict) as r:
-            await r.json()
+        url = self._url(ACTION_URL, action='finalize')
+        try:
+            await self._send('POST', url, 'finalize')
+        finally:
+            self.invalidate('tournament', 'participants')
 
     async def start(self):
-        url = os.path.join(BASE_CHALLONGE_API_URL, self.tournament_id,
-                           'start.json')
-        async with self.session.post(url, data=self.api_key_dict) as r:
-            await r.json()
+        url = self._url(ACTION_URL, action='start')
+        try:
+            await self._send('POST', url, 'start')
+        finally:
+            self.invalidate(*URLS)
 
-    @raw_dict
-    async def get_matches(self) -> List:
+    @loaded
+    async def get_matches(self) -> List[MatchRecord]:
         """Fetch latest match data.
 
-        Unlike the other variables, this one needs to be fetched every time
-        we use it.
+        Unlike the other variables, this one is only cached for a moment. If
+        the payload hasn't changed, the previous list is returned as is, and
+        only new records need their names filled in.
         """
-        matches = []
-        for m in await self.update_data('matches'):
-            m = m['match']
-
-            player1_id = m['player1_id']
-            player2_id = m['player2_id']
-            round_num = m['round']
-            winner_id = m['winner_id']
-            loser_id = m['loser_id']
+        await self.update_data('matches')
+        snapshot = self.snapshots['matches']
+        version = (snapshot.version, self.snapshots['participants'].version,
+                   self.losers_rounds, self.winners_rounds)
+        if self._matches is not None and self._matches_version == version:
+            return list(self._matches)
+
+        if self.graph is None or not self.graph.covers(snapshot.data):
+            round_name = (self.round_name if self._is_elimination()
+                          else 'R{}'.format)
+            self.graph = BracketGraph(snapshot.data, round_name)
 
-            if self._is_elimination():
-                round_name = self.round_name(round_num)
-            else:
-                round_name = f'R{round_num}'
-
-            if player1_id is None or player2_id is None:
+        matches = []
+        for m in snapshot.data:
+            if m.player1_id is None or m.player2_id is None:
                 continue
-
-            player1 = self.player_map[player1_id]
-            player2 = self.player_map[player2_id]
-
-            winner = None
-            loser = None
-            if winner_id is not None and loser_id is not None:
-                winner = self.player_map[winner_id]
-                loser = self.player_map[loser_id]
-
-            match = {
-                'id': m['id'],
-                'loser': loser,
-                'player1': player1,
-                'player1_id': player1_id,
-                'player2': player2,
-                'player2_id': player2_id,
-                'round': round_name,
-                'state': m['state'],
-                'suggested_play_order': m['suggested_play_order'],
-                'underway': m['underway_at'] is not None,
-                'winner': winner,
-            }
-            matches.append(match)
-        return matches
-
-    def _get_player_name(self, p) -> str:
-        return (p['participant']['name'].strip()
-                if p['participant']['name']
-                else p['participant']['username'].strip())
-
-    @raw_dict
+            m.resolve(version[1:], self.player_map, self.graph.label(m.id))
+            matches.append(m)
+
+        self._matches = matches
+        self._matches_version = version
+        self._match_index = {m.id: m for m in snapshot.data}
+        self._index_version = snapshot.version
+        return list(matches)
+
+    def match(self, match_id: int) -> Optional[MatchRecord]:
+        """The record for |match_id|, as of the last `get_matches`."""
+        return self._match_index.get(match_id)
+
+    def next_match(self, match_id: int,
+                   won: bool) -> Optional[MatchRecord]:
+        """The match the winner (or loser) of |match_id| plays next, as of
+        the last `get_matches`."""
+        if self.graph is None:
+            return None
+        edge = self.graph.next_match(match_id, won)
+        return None if edge is None else self._match_index[edge.match_id]
+
+    def unlocks(self, match_id: int) -> List[MatchRecord]:
+        """Matches that open when |match_id| is reported, as of the last
+        `get_matches`."""
+        if self.graph is None:
+            return []
+        return self.graph.unlocks(match_id, self._match_index)
+
+    def on_deck(self) -> List[OnDeck]:
+        """Matches one report away from opening, as of the last
+        `get_matches`."""
+        if self.graph is None:
+            return []
+        return self.graph.on_deck(self._match_index, self.player_map)
+
+    @loaded
     async def get_players(self) -> List[str]:
-        return [self._get_player_name(p)
-                for p in self.raw_dict['participants']]
+        return [p.name for p in self.players]
 
     async def get_top8(self) -> Optional[List]:
+        # The bracket may have been finalized on the Challonge site.
+        self.invalidate('tournament', 'participants')
         await self.get_raw()
         if self.get_state() != 'complete':
             return None
 
         top8 = collections.defaultdict(list)
-        for p in self.raw_dict['participants']:
-            rank = p['participant']['final_rank']
-            if rank <= 7:
-                top8[rank].append(self._get_player_name(p))
+        for p in self.players:
+            if p.final_rank is not None and p.final_rank <= 7:
+                top8[p.final_rank].append(p.name)
 
         return sorted(top8.items())
 
-    @raw_dict
-    async def _get_player(self, tag: str) -> Optional:
-        for p in self.raw_dict['participants']:
-            name = self._get_player_name(p)
-            if utils.istrcmp(tag, name):
-                return p
-        return None
+    @loaded
+    async def _get_player(self, tag: str) -> Optional[Participant]:
+        return self.participants.get(tag.strip().lower())
 
     async def _player_url(self, tag: str) -> str:
         p = await self._get_player(tag)
         if p is None:
             raise ValueError(f"Can't find player with tag: '{tag}'")
-        player = p['participant']
-        return PARTICIPANT_URL.format(self.tournament_id, player['id'])
+        return self._participant_url(p)
 
-    async def rename(self, tag: str, discord_name: str):
-        """Rename player from |tag| to |discord_name|."""
-        url = await self._player_url(tag)
+    def _participant_url(self, p: Participant) -> str:
+        return self._url(PARTICIPANT_URL, participant_id=p.id)
+
+    async def _rename(self, tag: str, url: str, discord_name: str):
         data = self.api_key_dict.copy()
         data['participant[name]'] = discord_name
         try:
-            async with self.session.put(url, data=data) as r:
-                await r.json()
+            await self._send('PUT', url, 'rename', data)
         except ClientResponseError as e:
             if e.code == 422:
                 raise ValueError(
@@ -279,23 +641,88 @@ class Challonge():
                     "Possible duplicate?") from ClientResponseError
             raise e
 
+    async def rename(self, tag: str, discord_name: str):
+        """Rename player from |tag| to |discord_name|."""
+        url = await self._player_url(tag)
+        try:
+            await self._rename(tag, url, discord_name)
+        finally:
+            self.invalidate('participants')
         await self.get_raw()
 
     async def dq(self, tag: str):
         url = await self._player_url(tag)
-        async with self.session.delete(url, data=self.api_key_dict) as r:
-            await r.json()
+        try:
+            await self._send('DELETE', url, 'dq')
+        finally:
+            self._invalidate_dq()
+
+    def _invalidate_dq(self):
+        """DQs forfeit the player's matches and move the bracket along."""
+        self.invalidate(*URLS)
+
+    @loaded
+    async def _bulk(self, tags: Iterable[str], action) -> Dict[str, str]:
+        """Run |action|(tag, participant url) for each player, a few at a
+        time. Returns tag -> error for the players that failed."""
+        targets = {}
+        errors = {}
+        for tag in tags:
+            p = await self._get_player(tag)
+            if p is None:
+                errors[tag] = "Can't find player"
+            else:
+                targets[tag] = self._participant_url(p)
+
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def run(tag, url):
+            async with semaphore:
+                try:
+                    await action(tag, url)
+                except ValueError as e:
+                    errors[tag] = str(e)
+                except ClientResponseError as e:
+                    errors[tag] = f'Challonge error {e.status}'
+
+        await asyncio.gather(*(run(tag, url) for tag, url in targets.items()))
+        return errors
+
+    async def bulk_dq(self, tags: Iterable[str]) -> Dict[str, str]:
+        """DQ every player in |tags|. Returns tag -> error for failures."""
+        async def dq(_tag, url):
+            await self._send('DELETE', url, 'dq')
+        try:
+            return await self._bulk(tags, dq)
+        finally:
+            self._invalidate_dq()
+
+    async def bulk_rename(self, names: Dict[str, str]) -> Dict[str, str]:
+        """Rename each tag in |names| to the name it maps to. Returns
+        tag -> error for failures."""
+        async def rename(tag, url):
+            await self._rename(tag, url, names[tag])
+        try:
+            errors = await self._bulk(names, rename)
+        finally:
+            self.invalidate('participants')
+        if len(errors) < len(names):
+            await self.get_raw()
+        return errors
 
 
 async def main():
     # tournament_id = 'mtvmelee-netplay2'
     tournament_id = 'djswerve1'
     api_key = os.environ.get('CHALLONGE_KEY')
-    async with aiohttp.ClientSession(raise_for_status=True) as session:
-        gar = Challonge(api_key, tournament_id, session)
+    transport = LiveTransport()
+    try:
+        gar = Challonge(api_key, tournament_id, transport)
         await gar.get_raw()
         await gar.rename('tinklefairy6', 'DJSwerve')
         print(await gar.get_players())
+    finally:
+        await transport.close()
 
 if __name__ == '__main__':
     loop = asyncio.get_event_loop()
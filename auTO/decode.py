@@ -0,0 +1,83 @@
+"""JSON decoding for Challonge responses.
+
+orjson is used when it's installed (`pip install auTO[fast]`), since match
+and participant lists are the largest payloads we handle.
+"""
+import codecs
+import json
+from typing import Any, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default_loads():
+    """The fastest decoder available."""
+    if orjson is not None:
+        return orjson.loads
+    return json.loads
+
+
+class ArrayDecoder():
+    """Decodes the items of a JSON array as the bytes come in.
+
+    Only the item being downloaded is buffered, so neither the whole body
+    nor the whole decoded list need to be held at once.
+    """
+    def __init__(self):
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.started = False
+        self.finished = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Returns the items completed by |chunk|."""
+        self.buffer += self.text.decode(chunk)
+        items = []
+        pos = 0
+        while True:
+            pos = self._skip(pos)
+            if pos == len(self.buffer) or self.finished:
+                break
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                # The rest of the item hasn't arrived yet.
+                break
+            after = end
+            while after < len(self.buffer) and self.buffer[after].isspace():
+                after += 1
+            if after == len(self.buffer) or self.buffer[after] not in ',]':
+                # A number may have been cut off, wait for what follows it.
+                # Anything else invalid is caught by `close`.
+                break
+            items.append(item)
+            pos = end
+        self.buffer = self.buffer[pos:]
+        return items
+
+    def close(self):
+        self.buffer += self.text.decode(b'', final=True)
+        if not self.finished or self.buffer[self._skip(0):]:
+            raise ValueError('Truncated or invalid JSON array')
+
+    def _skip(self, pos: int) -> int:
+        """Skip whitespace, the brackets and separators before an item."""
+        while pos < len(self.buffer):
+            c = self.buffer[pos]
+            if c.isspace() or c == ',':
+                pos += 1
+            elif c == '[' and not self.started:
+                self.started = True
+                pos += 1
+            elif c == ']' and self.started:
+                self.finished = True
+                pos += 1
+            elif not self.started or self.finished:
+                raise ValueError(f'Expected a JSON array, got {c!r}')
+            else:
+                break
+        return pos
@@ -0,0 +1,473 @@
+"""A local stand-in for the Challonge API.
+
+Implements the endpoints the Challonge class uses, closely enough to run a
+whole bracket against without an API key or network access.
+"""
+import asyncio
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import urllib.parse
+from typing import List, Optional
+
+from aiohttp import web
+
+# Placeholder for an empty bracket slot.
+BYE = object()
+
+API_PREFIX = '/v1/tournaments'
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def seed_order(size: int) -> List[int]:
+    """Standard bracket seeding, so the top seeds meet as late as possible."""
+    seeds = [1]
+    while len(seeds) < size:
+        total = len(seeds) * 2 + 1
+        seeds = [s for seed in seeds for s in (seed, total - seed)]
+    return seeds
+
+
+class FakeMatch():
+    def __init__(self, match_id: int, round_num: int):
+        self.id = match_id
+        self.round = round_num
+        self.slots = [None, None]
+        # (match id, is loser) the slot is filled from.
+        self.prereqs = [None, None]
+        self.state = 'pending'
+        self.winner = None
+        self.loser = None
+        self.scores_csv = ''
+        self.underway_at = None
+        self.updated_at = _now()
+        self.suggested_play_order = None
+        # Matches against byes are decided right away and never shown.
+        self.hidden = False
+
+    def touch(self):
+        self.updated_at = _now()
+
+    def to_json(self) -> dict:
+        def player(slot):
+            return None if slot is None or slot is BYE else slot
+
+        def prereq(i, field):
+            if self.prereqs[i] is None:
+                return None if field == 0 else False
+            return self.prereqs[i][field]
+
+        return {'match': {
+            'id': self.id,
+            'identifier': str(self.id),
+            'round': self.round,
+            'state': self.state,
+            'player1_id': player(self.slots[0]),
+            'player2_id': player(self.slots[1]),
+            'player1_prereq_match_id': prereq(0, 0),
+            'player2_prereq_match_id': prereq(1, 0),
+            'player1_is_prereq_match_loser': prereq(0, 1),
+            'player2_is_prereq_match_loser': prereq(1, 1),
+            'winner_id': player(self.winner),
+            'loser_id': player(self.loser),
+            'scores_csv': self.scores_csv,
+            'suggested_play_order': self.suggested_play_order,
+            'underway_at': self.underway_at,
+            'updated_at': self.updated_at,
+        }}
+
+
+class FakeTournament():
+    """A bracket and its advancement rules."""
+    def __init__(self, url: str, names: List[str],
+                 tournament_type: str = 'double elimination'):
+        self.url = url
+        self.name = url
+        self.tournament_type = tournament_type
+        self.state = 'pending'
+        self.ids = itertools.count(1)
+        self.participants = collections.OrderedDict()
+        for name in names:
+            self.add_participant(name)
+        self.matches = collections.OrderedDict()
+        # match id -> [(match, slot, is loser)] fed by its result.
+        self.feeds = collections.defaultdict(list)
+
+    def add_participant(self, name: str) -> dict:
+        participant = {
+            'id': next(self.ids),
+            'name': name,
+            'username': None,
+            'final_rank': None,
+            'group_player_ids': [],
+            'active': True,
+        }
+        self.participants[participant['id']] = participant
+        return participant
+
+    def to_json(self) -> dict:
+        visible = [m for m in self.matches.values() if not m.hidden]
+        done = sum(m.state == 'complete' for m in visible)
+        progress = int(100 * done / len(visible)) if visible else 0
+        return {'tournament': {
+            'id': self.url,
+            'name': self.name,
+            'url': self.url,
+            'full_challonge_url': f'https://challonge.com/{self.url}',
+            'state': self.state,
+            'tournament_type': self.tournament_type,
+            'participants_count': len(self.participants),
+            'progress_meter': progress,
+        }}
+
+    def _new_match(self, round_num: int) -> FakeMatch:
+        match = FakeMatch(next(self.ids), round_num)
+        self.matches[match.id] = match
+        return match
+
+    def _link(self, source: FakeMatch, target: FakeMatch, slot: int,
+              is_loser: bool = False):
+        target.prereqs[slot] = (source.id, is_loser)
+        self.feeds[source.id].append((target, slot, is_loser))
+
+    def _pair(self, sources, round_num: int, is_loser: bool = False):
+        """Matches between the results of consecutive |sources|."""
+        matches = []
+        for a, b in zip(sources[::2], sources[1::2]):
+            match = self._new_match(round_num)
+            self._link(a, match, 0, is_loser)
+            self._link(b, match, 1, is_loser)
+            matches.append(match)
+        return matches
+
+    def start(self):
+        players = list(self.participants)
+        size = 2
+        while size < len(players):
+            size *= 2
+        slots = [players[s - 1] if s <= len(players) else BYE
+                 for s in seed_order(size)]
+
+        winners = []
+        first = []
+        for a, b in zip(slots[::2], slots[1::2]):
+            match = self._new_match(1)
+            match.slots = [a, b]
+            first.append(match)
+        winners.append(first)
+        while len(winners[-1]) > 1:
+            winners.append(self._pair(winners[-1], len(winners) + 1))
+
+        if self.tournament_type == 'double elimination':
+            self._losers_bracket(winners)
+
+        self._order()
+        self.state = 'underway'
+        for match in first:
+            self._check(match)
+
+    def _losers_bracket(self, winners):
+        final = winners[-1][0]
+        if len(winners) == 1:
+            # Two players. The loser gets another shot in grand finals.
+            champion = final
+            is_loser = True
+        else:
+            losers = self._pair(winners[0], -1, is_loser=True)
+            round_num = -1
+            for drop in winners[1:]:
+                round_num -= 1
+                # Alternate the drop order so early rematches are rarer.
+                if len(drop) > 1 and round_num % 4 == 0:
+                    drop = drop[::-1]
+                dropped = []
+                for survivor, loser in zip(losers, drop):
+                    match = self._new_match(round_num)
+                    self._link(survivor, match, 0)
+                    self._link(loser, match, 1, is_loser=True)
+                    dropped.append(match)
+                losers = dropped
+                if len(losers) > 1:
+                    round_num -= 1
+                    losers = self._pair(losers, round_num)
+            champion = losers[0]
+            is_loser = False
+
+        grand_finals = self._new_match(len(winners) + 1)
+        self._link(final, grand_finals, 0)
+        self._link(champion, grand_finals, 1, is_loser)
+
+    def _order(self):
+        """Number matches by how deep in the bracket they are."""
+        depth = {}
+        for match in self.matches.values():
+            depth[match.id] = 1 + max(
+                (depth[p[0]] for p in match.prereqs if p is not None),
+                default=0)
+        ordered = sorted(self.matches.values(), key=lambda m: depth[m.id])
+        for i, match in enumerate(ordered, 1):
+            match.suggested_play_order = i
+
+    def _absent(self, slot) -> bool:
+        return slot is BYE or not self.participants[slot]['active']
+
+    def _check(self, match: FakeMatch):
+        """Open |match| once both players are known."""
+        if match.state == 'complete' or None in match.slots:
+            return
+        a, b = match.slots
+        if self._absent(a) or self._absent(b):
+            # Byes and DQed players forfeit.
+            match.hidden = a is BYE or b is BYE
+            if self._absent(a) and not self._absent(b):
+                a, b = b, a
+            self._complete(match, a, b)
+            return
+        match.state = 'open'
+        match.touch()
+
+    def _complete(self, match: FakeMatch, winner, loser, scores_csv=''):
+        match.state = 'complete'
+        match.winner = winner
+        match.loser = loser
+        match.scores_csv = scores_csv
+        match.touch()
+        for target, slot, is_loser in self.feeds[match.id]:
+            target.slots[slot] = loser if is_loser else winner
+            target.touch()
+            self._check(target)
+
+        if all(m.state == 'complete' for m in self.matches.values()):
+            self.state = 'awaiting_review'
+
+    def report(self, match_id: int, winner_id: int, scores_csv: str):
+        match = self.matches.get(match_id)
+        if match is None:
+            raise KeyError(match_id)
+        if match.state != 'open':
+            raise ValueError('Match is not open.')
+        if winner_id not in match.slots:
+            raise ValueError('Winner is not in this match.')
+        loser = next(p for p in match.slots if p != winner_id)
+        self._complete(match, winner_id, loser, scores_csv)
+
+    def mark_underway(self, match_id: int):
+        match = self.matches[match_id]
+        if match.state != 'open':
+            raise ValueError('Match is not open.')
+        match.underway_at = _now()
+        match.touch()
+
+    def rename(self, participant_id: int, name: str):
+        if any(p['name'].lower() == name.lower()
+               for p in self.participants.values()
+               if p['id'] != participant_id):
+            raise ValueError('Name has already been taken.')
+        self.participants[participant_id]['name'] = name
+
+    def remove(self, participant_id: int):
+        """Remove the participant, or DQ them once the bracket started."""
+        if self.state == 'pending':
+            del self.participants[participant_id]
+            return
+        self.participants[participant_id]['active'] = False
+        for match in list(self.matches.values()):
+            if match.state == 'open' and participant_id in match.slots:
+                match.state = 'pending'
+                self._check(match)
+
+    def finalize(self):
+        if self.state != 'awaiting_review':
+            raise ValueError('Tournament is not finished.')
+        self._rank()
+        self.state = 'complete'
+
+    def _rank(self):
+        """Players knocked out in the same round share a rank."""
+        last = max(self.matches.values(), key=lambda m: m.round)
+        ranked = [[last.winner], [last.loser]]
+        if self.tournament_type == 'double elimination':
+            rounds = sorted({m.round for m in self.matches.values()
+                             if m.round < 0})
+        else:
+            rounds = sorted({m.round for m in self.matches.values()
+                             if m.round != last.round}, reverse=True)
+        for round_num in rounds:
+            ranked.append([m.loser for m in self.matches.values()
+                           if m.round == round_num])
+
+        rank = 1
+        for group in ranked:
+            group = [p for p in group if p is not BYE]
+            for p in group:
+                self.participants[p]['final_rank'] = rank
+            rank += len(group)
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({'errors': [message]}, status=status)
+
+
+class FakeChallonge():
+    """Serves fake tournaments over HTTP and counts the calls it gets."""
+    def __init__(self, api_key: str = 'fake', latency: float = 0):
+        self.api_key = api_key
+        self.latency = latency
+        self.tournaments = {}
+        self.calls = collections.Counter()
+        self.runner = None
+        self.base_url = None
+
+        self.app = web.Application(middlewares=[self._middleware])
+        p = API_PREFIX
+        self.app.router.add_routes([
+            web.get(p + '/{tid}.json', self.get_tournament),
+            web.get(p + '/{tid}/participants.json', self.get_participants),
+            web.get(p + '/{tid}/matches.json', self.get_matches),
+            web.put(p + '/{tid}/matches/{mid}.json', self.report),
+            web.post(p + '/{tid}/matches/{mid}/mark_as_underway.json',
+                     self.mark_underway),
+            web.post(p + '/{tid}/start.json', self.start_tournament),
+            web.post(p + '/{tid}/finalize.json', self.finalize),
+            web.put(p + '/{tid}/participants/{pid}.json', self.rename),
+            web.delete(p + '/{tid}/participants/{pid}.json', self.remove),
+        ])
+
+    def add_tournament(self, url: str, names: List[str],
+                       tournament_type: str = 'double elimination'):
+        tourney = FakeTournament(url, names, tournament_type)
+        self.tournaments[url] = tourney
+        return tourney
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving. Returns the base URL to give the Challonge class."""
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f'http://{host}:{port}{API_PREFIX}'
+        return self.base_url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        resource = request.match_info.route.resource
+        name = resource.canonical if resource is not None else request.path
+        self.calls[f'{request.method} {name}'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        form = await self._form(request)
+        if form.get('api_key') != self.api_key:
+            return _error(401, 'Unauthorized')
+        request['form'] = form
+        if request.match_info.get('tid') not in self.tournaments:
+            return _error(404, 'Not found')
+        return await handler(request)
+
+    async def _form(self, request) -> dict:
+        """aiohttp doesn't parse bodies of DELETE requests, so we do."""
+        form = dict(request.query)
+        body = await request.text()
+        if body:
+            form.update(urllib.parse.parse_qsl(body))
+        return form
+
+    def _tournament(self, request) -> FakeTournament:
+        return self.tournaments[request.match_info['tid']]
+
+    def _json(self, request, data) -> web.Response:
+        """JSON response that honors conditional GETs."""
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=body, content_type='application/json',
+                            headers={'ETag': etag})
+
+    async def get_tournament(self, request):
+        return self._json(request, self._tournament(request).to_json())
+
+    async def get_participants(self, request):
+        return self._json(request, [
+            {'participant': p}
+            for p in self._tournament(request).participants.values()])
+
+    async def get_matches(self, request):
+        return self._json(request, [
+            m.to_json() for m in self._tournament(request).matches.values()
+            if not m.hidden])
+
+    def _match_id(self, request) -> int:
+        return int(request.match_info['mid'])
+
+    async def report(self, request):
+        tourney = self._tournament(request)
+        form = request['form']
+        try:
+            tourney.report(self._match_id(request),
+                           int(form['match[winner_id]']),
+                           form.get('match[scores_csv]', ''))
+        except KeyError:
+            return _error(404, 'Match not found')
+        except ValueError as e:
+            return _error(422, str(e))
+        return self._json(
+            request, tourney.matches[self._match_id(request)].to_json())
+
+    async def mark_underway(self, request):
+        tourney = self._tournament(request)
+        try:
+            tourney.mark_underway(self._match_id(request))
+        except KeyError:
+            return _error(404, 'Match not found')
+        except ValueError as e:
+            return _error(422, str(e))
+        return self._json(
+            request, tourney.matches[self._match_id(request)].to_json())
+
+    async def start_tournament(self, request):
+        tourney = self._tournament(request)
+        if tourney.state != 'pending' or len(tourney.participants) < 2:
+            return _error(422, 'Tournament cannot be started.')
+        tourney.start()
+        return self._json(request, tourney.to_json())
+
+    async def finalize(self, request):
+        tourney = self._tournament(request)
+        try:
+            tourney.finalize()
+        except ValueError as e:
+            return _error(422, str(e))
+        return self._json(request, tourney.to_json())
+
+    def _participant(self, request) -> Optional[dict]:
+        return self._tournament(request).participants.get(
+            int(request.match_info['pid']))
+
+    async def rename(self, request):
+        participant = self._participant(request)
+        if participant is None:
+            return _error(404, 'Participant not found')
+        try:
+            self._tournament(request).rename(
+                participant['id'], request['form']['participant[name]'])
+        except ValueError as e:
+            return _error(422, str(e))
+        return self._json(request, {'participant': participant})
+
+    async def remove(self, request):
+        participant = self._participant(request)
+        if participant is None:
+            return _error(404, 'Participant not found')
+        self._tournament(request).remove(participant['id'])
+        return self._json(request, {'participant': participant})
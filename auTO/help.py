@@ -15,6 +15,15 @@ class HelpDoc(dict):
 help = dict(
     bracket=HelpDoc('print the bracket URL'),
     matches=HelpDoc('print the current matches'),
+    mass_dq=HelpDoc(
+        'DQ several players',
+        'DQ every listed player, by mention or Challonge tag.',
+        '@Player1 "TAG 2" ...'),
+    mass_rename=HelpDoc(
+        'rename several players to their Discord tags',
+        ('Rename players from a list with one `TAG = @Player` per line, '
+         'typed after the command or in an attached text file.'),
+        'TAG = @Player\nTAG = @Player ...'),
     noshow=HelpDoc(
         'start DQ process for player',
         ('Notify @Player that they are in danger of being DQed. They have '
@@ -37,8 +46,11 @@ help = dict(
         'Print Top 8 if the bracket is finished.'),
     start=HelpDoc(
         'start running bracket',
-        'Start TOing and calling matches.',
+        'Start TOing and calling matches in this channel.',
         'CHALLONGE_URL'),
+    stats=HelpDoc(
+        'print API usage',
+        'Print command latency and Challonge/Discord API usage.'),
     status=HelpDoc('how far along the tournament is'),
     stop=HelpDoc('stop TOing'),
     update_tags=HelpDoc('get latest Challonge tags'),
@@ -0,0 +1,184 @@
+"""Crash-safe storage for running tournaments."""
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import time
+from typing import List
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+JOURNAL_FILE = 'auTO.db'
+# Checkpoint the write-ahead log after this many writes.
+COMPACT_EVERY = 500
+# Seconds after which a worker that stopped heartbeating loses its shards.
+LEASE_TIMEOUT = 90
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tournaments (
+    guild_id INTEGER NOT NULL,
+    tournament_id TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (guild_id, tournament_id)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    guild_id INTEGER NOT NULL,
+    tournament_id TEXT NOT NULL,
+    match_id INTEGER NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (guild_id, tournament_id, match_id)
+);
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+'''
+SAVE_TOURNAMENT = 'INSERT OR REPLACE INTO tournaments VALUES (?, ?, ?)'
+SAVE_MATCH = 'INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)'
+
+
+class Journal():
+    """SQLite store for TournamentPickle and MatchPickle state.
+
+    Every call, report and channel creation is written as its own small
+    transaction, so a crash loses at most the change in flight. Writes run
+    on a dedicated thread to keep disk I/O off the event loop.
+
+    The database is shared by every worker process when running sharded, and
+    also records which worker owns which shard.
+    """
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        # A single thread keeps writes in order.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.writes = 0
+
+    def load(self) -> dict:
+        """Lists of saved tournaments keyed by guild id, with their
+        matches."""
+        saved = collections.defaultdict(list)
+        for guild_id, state in self.conn.execute(
+                'SELECT guild_id, state FROM tournaments'):
+            try:
+                saved[guild_id].append(pickle.loads(state))
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning(f'Error loading tournament: {e}')
+
+        matches = collections.defaultdict(dict)
+        for guild_id, tournament_id, match_id, state in self.conn.execute(
+                'SELECT guild_id, tournament_id, match_id, state '
+                'FROM matches'):
+            try:
+                matches[(guild_id, tournament_id)][match_id] = (
+                    pickle.loads(state))
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning(f'Error loading match: {e}')
+
+        for guild_id, tps in saved.items():
+            for tp in tps:
+                tp.matches = matches[(guild_id, tp.tournament_id)]
+        return dict(saved)
+
+    def import_saved(self, saved: dict):
+        """Import tournaments saved by an older version of auTO."""
+        with self.conn:
+            for guild_id, tp in saved.items():
+                matches, tp.matches = tp.matches, {}
+                self.conn.execute(SAVE_TOURNAMENT, (
+                    guild_id, tp.tournament_id, pickle.dumps(tp)))
+                for mp in matches.values():
+                    self.conn.execute(SAVE_MATCH, (
+                        guild_id, tp.tournament_id, mp.id, pickle.dumps(mp)))
+                tp.matches = matches
+
+    async def save_tournament(self, guild_id: int, tp):
+        """Save a TournamentPickle. Its matches are saved separately."""
+        await self._write(SAVE_TOURNAMENT,
+                          (guild_id, tp.tournament_id, pickle.dumps(tp)))
+
+    async def delete_tournament(self, guild_id: int, tournament_id: str):
+        await self._write(
+            'DELETE FROM tournaments WHERE guild_id = ? '
+            'AND tournament_id = ?', (guild_id, tournament_id))
+        await self._write(
+            'DELETE FROM matches WHERE guild_id = ? AND tournament_id = ?',
+            (guild_id, tournament_id))
+
+    async def save_match(self, guild_id: int, tournament_id: str, mp):
+        await self._write(SAVE_MATCH,
+                          (guild_id, tournament_id, mp.id, pickle.dumps(mp)))
+
+    async def delete_match(self, guild_id: int, tournament_id: str,
+                           match_id: int):
+        await self._write(
+            'DELETE FROM matches WHERE guild_id = ? AND tournament_id = ? '
+            'AND match_id = ?', (guild_id, tournament_id, match_id))
+
+    def claim_shards(self, shard_ids: List[int]):
+        """Take ownership of |shard_ids|.
+
+        Blocks until whoever had them last has released them or stopped
+        heartbeating, so a guild is never run by two workers at once.
+        """
+        while True:
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                held = [shard_id for shard_id, owner, heartbeat
+                        in self.conn.execute(
+                            'SELECT shard_id, owner, heartbeat FROM shards')
+                        if shard_id in shard_ids and owner != self.owner and
+                        time.time() - heartbeat < LEASE_TIMEOUT]
+                if not held:
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO shards VALUES (?, ?, ?)',
+                        [(i, self.owner, time.time()) for i in shard_ids])
+                    return
+            log.info(f'Waiting for shards {held} to be released.')
+            time.sleep(5)
+
+    async def heartbeat(self, shard_ids: List[int]):
+        marks = ','.join('?' * len(shard_ids))
+        await self._write(
+            'UPDATE shards SET heartbeat = ? WHERE owner = ? AND shard_id IN '
+            f'({marks})',
+            (time.time(), self.owner, *shard_ids))
+
+    async def release_shards(self, shard_ids: List[int]):
+        marks = ','.join('?' * len(shard_ids))
+        await self._write(
+            f'DELETE FROM shards WHERE owner = ? AND shard_id IN ({marks})',
+            (self.owner, *shard_ids))
+
+    async def _write(self, sql: str, params):
+        loop = asyncio.get_event_loop()
+        with metrics.SAVES.time(kind='journal'):
+            await loop.run_in_executor(
+                self.executor, self._execute, sql, params)
+
+    def _execute(self, sql: str, params):
+        with self.conn:
+            self.conn.execute(sql, params)
+        self.writes += 1
+        if self.writes % COMPACT_EVERY == 0:
+            self._compact()
+
+    def _compact(self):
+        """Fold the write-ahead log back into the database."""
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self._compact()
+        self.conn.close()
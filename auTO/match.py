@@ -1,4 +1,3 @@
-import asyncio
 import functools
 import logging
 from random import random
@@ -7,6 +6,8 @@ from typing import Optional
 import discord
 
 from . import utils
+from .members import fold
+from .records import MatchRecord
 
 log = logging.getLogger(__name__)
 
@@ -58,15 +59,11 @@ class MatchPickle():
         self.channel_ids = [c.id for c in match.channels]
 
     def unpickle(self, tourney):
-        fake_raw = {
-            'id': self.id,
-            'player1': self.player1_tag,
-            'player2': self.player2_tag,
-            'player1_id': self.player1_id,
-            'player2_id': self.player2_id,
-        }
+        record = MatchRecord(self.id, self.player1_id, self.player2_id,
+                             player1=self.player1_tag,
+                             player2=self.player2_tag)
 
-        match = Match(tourney, fake_raw, self.rps)
+        match = Match(tourney, record, self.rps)
         for c in self.channel_ids:
             channel = tourney.guild.get_channel(c)
             if channel is not None:
@@ -76,16 +73,17 @@ class MatchPickle():
 
 class Match():
     """Handles private channel creation."""
-    def __init__(self, tourney, raw, rps=None):
+    def __init__(self, tourney, record: MatchRecord, rps=None):
         if rps is None:
             self.rps = random() < .5
         else:
             self.rps = rps
-        self.id = raw['id']
-        self.player1_tag = raw['player1']
-        self.player2_tag = raw['player2']
-        self.player1_id = raw['player1_id']
-        self.player2_id = raw['player2_id']
+        self.id = record.id
+        self.player1_tag = record.player1
+        self.player2_tag = record.player2
+        self.player1_id = record.player1_id
+        self.player2_id = record.player2_id
+        self.play_order = record.suggested_play_order
         self.tourney = tourney
         self.guild = tourney.guild
         self.player1 = tourney.get_user(self.player1_tag)
@@ -111,17 +109,16 @@ class Match():
             return f'{player1} vs {player2}'
         return f'{player2} vs {player1}'
 
-    def has_player(self, tag: str) -> bool:
-        return tag.lower() in list(
-            map(lambda s: s.lower(), [self.player1_tag, self.player2_tag]))
-
     def update_player(self, old_tag: str, member: discord.Member):
-        if utils.istrcmp(self.player1_tag, old_tag):
+        self.tourney.unindex_match(self)
+        old_tag = fold(old_tag)
+        if fold(self.player1_tag) == old_tag:
             self.player1_tag = member.display_name
             self.player1 = member
-        elif utils.istrcmp(self.player2_tag, old_tag):
+        elif fold(self.player2_tag) == old_tag:
             self.player2_tag = member.display_name
             self.player2 = member
+        self.tourney.index_match(self)
 
     @manage_channels
     async def create_channels(self):
@@ -144,13 +141,14 @@ class Match():
 
         name = utils.channel_name(self.name())
 
-        self.channels = await asyncio.gather(
-            self.tourney.category.create_text_channel(
-                name, overwrites=overwrites),
-            self.tourney.category.create_voice_channel(
-                name, overwrites=voice_overwrites)
-        )
+        self.channels = await self.tourney.pool.acquire(
+            self.play_order, name, overwrites, voice_overwrites)
+        if self.tourney.called_matches.get(self.id) is not self:
+            # Reported while its channels were being set up.
+            await self.close()
+            return
 
+        await self.tourney.save_match(self)
         text = self.channels[0]
 
         rps_winner = (self.player1.display_name if self.rps
@@ -163,7 +161,6 @@ class Match():
 
     @manage_channels
     async def close(self):
-        try:
-            await asyncio.gather(*(c.delete() for c in self.channels))
-        except discord.HTTPException as e:
-            log.warning(e)
+        channels = self.channels
+        self.channels = []
+        await self.tourney.pool.release(channels)
@@ -0,0 +1,132 @@
+"""Index of guild members by display name."""
+import collections
+import math
+from typing import List, Optional, Set, Tuple
+
+import discord
+
+# How similar a name has to be to be suggested, from 0 to 1.
+MIN_SIMILARITY = .5
+MAX_SUGGESTIONS = 3
+
+
+def fold(name: str) -> str:
+    """The key names are indexed under."""
+    return name.strip().casefold()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    """Dice coefficient of two trigram sets."""
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class MemberIndex():
+    """Casefolded display name to member lookup for a single guild.
+
+    Built once from the member list, then kept current from the member
+    events instead of scanning `guild.members` on every lookup.
+    """
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        # folded name -> {member id: member}
+        self._by_name = collections.defaultdict(dict)
+        # member id -> folded name, so we can find the old entry on update.
+        self._names = {}
+        # trigram -> folded names containing it, for fuzzy suggestions.
+        self._grams = collections.defaultdict(set)
+        for member in guild.members:
+            self.add(member)
+
+    def add(self, member: discord.Member):
+        key = fold(member.display_name)
+        self._names[member.id] = key
+        if key not in self._by_name:
+            for gram in trigrams(key):
+                self._grams[gram].add(key)
+        self._by_name[key][member.id] = member
+
+    def remove(self, member: discord.Member):
+        key = self._names.pop(member.id, None)
+        if key is None:
+            return
+        members = self._by_name[key]
+        members.pop(member.id, None)
+        if not members:
+            del self._by_name[key]
+            for gram in trigrams(key):
+                keys = self._grams[gram]
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+    def update(self, member: discord.Member):
+        self.remove(member)
+        self.add(member)
+
+    def candidates(self, name: str) -> List[discord.Member]:
+        """All members whose display name matches, ignoring case."""
+        return list(self._by_name.get(fold(name), {}).values())
+
+    def is_ambiguous(self, name: str) -> bool:
+        return len(self.candidates(name)) > 1 and self.get(name) is None
+
+    def get(self, name: str) -> Optional[discord.Member]:
+        """Get member by display name.
+
+        If several members share the name, the one with the exact same
+        casing wins. Otherwise there's no way to tell who's who, so we don't
+        guess.
+        """
+        candidates = self.candidates(name)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        exact = [m for m in candidates if m.display_name == name.strip()]
+        if len(exact) == 1:
+            return exact[0]
+        return None
+
+    def suggest(self, name: str,
+                limit: int = MAX_SUGGESTIONS) -> List[discord.Member]:
+        """Members with names similar to |name|, best first.
+
+        Handles typos and sponsor prefixes like "TSM | Leffen". Only names
+        sharing enough trigrams with |name| are looked at, so this doesn't
+        scan the whole server.
+        """
+        scores = {}
+        queries = [fold(name)]
+        if '|' in name:
+            queries.append(fold(name.split('|')[-1]))
+        for query in queries:
+            for key, score in self._similar(query):
+                scores[key] = max(score, scores.get(key, 0))
+
+        best = sorted(scores, key=lambda k: (-scores[k], k))
+        members = []
+        for key in best:
+            members.extend(self._by_name[key].values())
+        return members[:limit]
+
+    def _similar(self, query: str) -> List[Tuple[str, float]]:
+        grams = trigrams(query)
+        # A name needs at least this many trigrams in common to be similar
+        # enough, so it has to contain one of the rarest len - need + 1 of
+        # ours. Only names from those posting lists need scoring.
+        need = math.ceil(MIN_SIMILARITY * len(grams) / (2 - MIN_SIMILARITY))
+        rarest = sorted(grams, key=lambda g: len(self._grams.get(g, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - need + 1]:
+            candidates.update(self._grams.get(gram, ()))
+
+        similar = []
+        for key in candidates:
+            score = _similarity(grams, trigrams(key))
+            if score >= MIN_SIMILARITY:
+                similar.append((key, score))
+        return similar
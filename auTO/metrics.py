@@ -0,0 +1,140 @@
+"""Counters and latency histograms, exported in the Prometheus text format."""
+import bisect
+import collections
+import contextlib
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# Latency histogram buckets, in seconds.
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return '{' + pairs + '}'
+
+
+class Counter():
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self.values = collections.Counter()
+
+    def inc(self, amount: float = 1, **labels):
+        self.values[tuple(sorted(labels.items()))] += amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.doc}',
+                 f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_labels(labels)} {value}')
+        return lines
+
+
+class Histogram():
+    def __init__(self, name: str, doc: str, buckets=BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., overflow, count, sum]
+        self.values = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        counts = self.values.get(key)
+        if counts is None:
+            counts = [0] * (len(self.buckets) + 3)
+            self.values[key] = counts
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += 1
+        counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    async def timed(self, aw, **labels):
+        """Await |aw| and observe how long it took."""
+        with self.time(**labels):
+            return await aw
+
+    def summary(self, by: str, **match) -> Dict[str, Tuple[int, float]]:
+        """(count, sum) grouped by the |by| label, for label sets that
+        contain |match|."""
+        wanted = set(match.items())
+        totals = collections.defaultdict(lambda: (0, 0))
+        for labels, counts in self.values.items():
+            if not wanted <= set(labels):
+                continue
+            key = dict(labels).get(by)
+            count, total = totals[key]
+            totals[key] = (count + counts[-2], total + counts[-1])
+        return dict(totals)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.doc}',
+                 f'# TYPE {self.name} histogram']
+        for labels, counts in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = labels + (('le', bound),)
+                lines.append(f'{self.name}_bucket{_labels(le)} {cumulative}')
+            le = labels + (('le', '+Inf'),)
+            lines.append(f'{self.name}_bucket{_labels(le)} {counts[-2]}')
+            lines.append(f'{self.name}_count{_labels(labels)} {counts[-2]}')
+            lines.append(f'{self.name}_sum{_labels(labels)} {counts[-1]}')
+        return lines
+
+
+COMMANDS = Histogram(
+    'auto_command_seconds', 'Time spent running each command.')
+COMMAND_ERRORS = Counter(
+    'auto_command_errors_total', 'Commands that raised an error.')
+CHALLONGE = Histogram(
+    'auto_challonge_request_seconds', 'Challonge API requests.')
+DISCORD = Histogram(
+    'auto_discord_request_seconds', 'Discord channel and message operations.')
+SAVES = Histogram(
+    'auto_save_seconds', 'Time spent saving tournament state.')
+
+REGISTRY = [COMMANDS, COMMAND_ERRORS, CHALLONGE, DISCORD, SAVES]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+async def _handle(_request):
+    return web.Response(text=render(), content_type='text/plain')
+
+
+async def serve(port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    """Serve the metrics at http://host:port/metrics."""
+    app = web.Application()
+    app.router.add_get('/metrics', _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info(f'Serving metrics on {host}:{port}.')
+    return runner
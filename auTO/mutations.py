@@ -0,0 +1,99 @@
+"""Queue for channel creation, edits and deletion."""
+import asyncio
+import itertools
+import logging
+
+import discord
+
+from . import metrics
+from .actor import run_into
+from . import ratelimit
+
+log = logging.getLogger(__name__)
+
+# Channel operations in flight at once per guild.
+MAX_CONCURRENCY = 2
+# Channel operations started per second per guild, and how far we can burst.
+RATE_LIMIT = 2
+RATE_BURST = 5
+MAX_ATTEMPTS = 3
+
+# Lower runs first. Creates are ordered by when the match should be played.
+CREATE = 0
+CLEANUP = 1
+
+
+class MutationScheduler():
+    """Runs a guild's channel operations with bounded concurrency.
+
+    Operations are queued by priority, so channels for the matches that are
+    due first are set up first, and cleanup waits for them.
+    """
+    def __init__(self, guild_id: int, workers: int = MAX_CONCURRENCY):
+        self.guild_id = guild_id
+        self.queue = asyncio.PriorityQueue()
+        self.bucket = ratelimit.TokenBucket(RATE_LIMIT, RATE_BURST)
+        self.num_workers = workers
+        self.workers = []
+        # Keeps operations with the same priority in FIFO order.
+        self.counter = itertools.count()
+        self.closed = False
+
+    async def create(self, order, factory, op: str = 'channel_create'):
+        """Run |factory|, a function returning a creation coroutine."""
+        return await self._submit((CREATE, order or 0), op, factory)
+
+    async def edit(self, order, factory):
+        """Like `create`, for setting up an existing channel."""
+        return await self.create(order, factory, 'channel_edit')
+
+    async def cleanup(self, factory, op: str):
+        return await self._submit((CLEANUP, 0), op, factory)
+
+    async def delete(self, factory):
+        return await self.cleanup(factory, 'channel_delete')
+
+    def close(self):
+        """Stop running operations. Queued and running ones are
+        cancelled."""
+        self.closed = True
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+        while not self.queue.empty():
+            *_, future = self.queue.get_nowait()
+            future.cancel()
+
+    async def _submit(self, priority, op: str, factory):
+        if self.closed:
+            raise asyncio.CancelledError()
+        if not self.workers:
+            self.workers = [asyncio.ensure_future(self._work())
+                            for _ in range(self.num_workers)]
+        future = asyncio.get_event_loop().create_future()
+        self.queue.put_nowait(
+            (priority, next(self.counter), op, factory, future))
+        return await future
+
+    async def _work(self):
+        while True:
+            _, _, op, factory, future = await self.queue.get()
+            if future.done():
+                continue
+            await run_into(future, self._call(factory, op))
+
+    async def _call(self, factory, op: str):
+        """discord.py already waits out rate limits, but it can give up."""
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                return await metrics.DISCORD.timed(
+                    factory(), op=op, guild=str(self.guild_id))
+            except discord.HTTPException as e:
+                attempt += 1
+                if e.status != 429 or attempt == MAX_ATTEMPTS:
+                    raise
+                delay = ratelimit.backoff(attempt)
+                log.warning(f'Rate limited, retrying in {delay:.1f}s.')
+                await asyncio.sleep(delay)
@@ -0,0 +1,76 @@
+"""Background polling for changes made on the Challonge site."""
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+# Seconds between polls right after something changed.
+FAST_INTERVAL = 5
+# Longest wait while a match is being played.
+ACTIVE_INTERVAL = 15
+# Longest wait while nothing is going on.
+IDLE_INTERVAL = 60
+BACKOFF = 1.5
+
+
+class Poller():
+    """Polls a tournament's matches so results reported directly on
+    challonge.com get picked up without anyone running `matches`.
+
+    Polls quickly after changes and backs off while nothing happens. Only
+    asks for a refresh when the open matches actually differ from what we've
+    called.
+    """
+    def __init__(self, tourney):
+        self.tourney = tourney
+        self.interval = FAST_INTERVAL
+        self.underway = None
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.task = None
+
+    def _backoff(self, active: bool):
+        limit = ACTIVE_INTERVAL if active else IDLE_INTERVAL
+        self.interval = min(self.interval * BACKOFF, limit)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if not await self.poll():
+                    return
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning(f'Error polling matches: {e}')
+                self._backoff(False)
+
+    async def poll(self) -> bool:
+        """Check for changes. Returns whether to keep polling."""
+        open_matches = await self.tourney.get_open_matches()
+        if not open_matches and self.tourney.gar.unconfirmed:
+            # Only our guess says it's over, check with Challonge.
+            self.tourney.gar.invalidate('matches')
+            open_matches = await self.tourney.get_open_matches()
+        if not open_matches:
+            # The refresh wraps up the tournament.
+            self.tourney.refresher.mark_dirty()
+            return False
+
+        open_ids = {m.id for m in open_matches}
+        underway = {m.id for m in open_matches if m.underway}
+        changed = (open_ids != set(self.tourney.called_matches) or
+                   (self.underway is not None and underway != self.underway))
+        self.underway = underway
+
+        if changed:
+            self.tourney.refresher.mark_dirty()
+            self.interval = FAST_INTERVAL
+        else:
+            self._backoff(bool(underway))
+        return True
@@ -0,0 +1,130 @@
+"""Reusing match channels instead of creating new ones for every match."""
+import asyncio
+import collections
+import functools
+import logging
+import time
+from typing import List
+
+import discord
+
+from .match import DEFAULT, PLAYER_PERM
+
+log = logging.getLogger(__name__)
+
+# Discord allows this many renames per channel every RENAME_WINDOW seconds.
+RENAME_LIMIT = 2
+RENAME_WINDOW = 10 * 60
+
+
+class ChannelPool():
+    """Idle text/voice channel pairs under a tournament's matches category.
+
+    When a match is over its channels are hidden and the text history is
+    cleared, then they're renamed and handed to the next match. Channel
+    creation is one of Discord's most rate limited routes, while edits are
+    limited per channel, so this keeps calling matches fast.
+    """
+    def __init__(self, tourney):
+        self.tourney = tourney
+        # Oldest first, since Discord only allows a couple of renames per
+        # channel every 10 minutes.
+        self.idle = collections.deque()
+        # Ids of channels being hidden and cleared before they're idle.
+        self.releasing = set()
+        # Text channel id -> when the pair was last renamed.
+        self.renames = {}
+
+    def ids(self):
+        return {c.id for pair in self.idle for c in pair} | self.releasing
+
+    def clear(self):
+        self.idle.clear()
+        self.renames.clear()
+
+    def _can_rename(self, text, now: float) -> bool:
+        renames = self.renames.get(text.id, ())
+        return len(renames) < RENAME_LIMIT or now - renames[0] >= RENAME_WINDOW
+
+    async def acquire(self, order, name: str, overwrites,
+                      voice_overwrites) -> List[discord.abc.GuildChannel]:
+        """Text and voice channels called |name| for a match due at
+        |order|."""
+        mutations = self.tourney.mutations
+        while True:
+            # Renaming a pair past the limit would stall for minutes, make
+            # new channels instead.
+            now = time.monotonic()
+            pair = next((p for p in self.idle
+                         if self._can_rename(p[0], now)), None)
+            if pair is None:
+                break
+            self.idle.remove(pair)
+            text, voice = pair
+            names = {}
+            if text.name != name or voice.name != name:
+                names['name'] = name
+            try:
+                await asyncio.gather(
+                    mutations.edit(order, functools.partial(
+                        text.edit, overwrites=overwrites, **names)),
+                    mutations.edit(order, functools.partial(
+                        voice.edit, overwrites=voice_overwrites, **names)))
+            except discord.NotFound:
+                # Someone deleted it, clean_up_channels gets the other one.
+                log.warning('Pooled match channel is missing.')
+                self.renames.pop(text.id, None)
+                continue
+            if names:
+                self.renames.setdefault(text.id, collections.deque(
+                    maxlen=RENAME_LIMIT)).append(now)
+            return [text, voice]
+
+        category = self.tourney.category
+        return list(await asyncio.gather(
+            mutations.create(order, functools.partial(
+                category.create_text_channel, name, overwrites=overwrites)),
+            mutations.create(order, functools.partial(
+                category.create_voice_channel, name,
+                overwrites=voice_overwrites))))
+
+    async def release(self, channels: List[discord.abc.GuildChannel]):
+        """Hide a finished match's channels and keep them for later."""
+        mutations = self.tourney.mutations
+        if len(channels) != 2:
+            await self._delete(channels)
+            return
+
+        text, voice = channels
+        guild = self.tourney.guild
+        hidden = {guild.default_role: DEFAULT, guild.me: PLAYER_PERM}
+        ids = {text.id, voice.id}
+        self.releasing |= ids
+        try:
+            await asyncio.gather(
+                mutations.cleanup(functools.partial(
+                    text.edit, overwrites=hidden), 'channel_edit'),
+                mutations.cleanup(functools.partial(
+                    voice.edit, overwrites=hidden), 'channel_edit'),
+                mutations.cleanup(functools.partial(
+                    text.purge, limit=None), 'message_purge'),
+                # So nobody is left in the next match's voice channel.
+                *(mutations.cleanup(functools.partial(
+                    member.move_to, None), 'member_move')
+                  for member in voice.members))
+        except discord.HTTPException as e:
+            log.warning(f"Can't reuse match channels, deleting them: {e}")
+            await self._delete(channels)
+            return
+        finally:
+            self.releasing -= ids
+        self.idle.append((text, voice))
+
+    async def _delete(self, channels):
+        for c in channels:
+            self.renames.pop(c.id, None)
+        try:
+            await asyncio.gather(*(self.tourney.mutations.delete(c.delete)
+                                   for c in channels))
+        except discord.HTTPException as e:
+            log.warning(e)
@@ -0,0 +1,119 @@
+"""Compact records for the parts of Challonge's responses auTO uses.
+
+Responses are parsed into these as they come in and the JSON is dropped, so
+each tournament only holds on to a few fields per participant and match.
+"""
+import sys
+from typing import Dict, Optional
+
+
+def _intern(s: Optional[str]) -> Optional[str]:
+    return None if s is None else sys.intern(s)
+
+
+class BracketInfo():
+    __slots__ = ('name', 'url', 'state', 'tournament_type', 'progress_meter')
+
+    def __init__(self, name: str, url: str, state: str, tournament_type: str,
+                 progress_meter: int):
+        self.name = name
+        self.url = url
+        self.state = _intern(state)
+        self.tournament_type = _intern(tournament_type)
+        self.progress_meter = progress_meter
+
+    @classmethod
+    def from_json(cls, t):
+        t = t['tournament']
+        return cls(t['name'].strip(), t['full_challonge_url'], t['state'],
+                   t['tournament_type'], t['progress_meter'])
+
+    def is_elimination(self) -> bool:
+        return self.tournament_type.endswith('elimination')
+
+
+class Participant():
+    __slots__ = ('id', 'name', 'group_player_ids', 'final_rank')
+
+    def __init__(self, id: int, name: str, group_player_ids=(),
+                 final_rank: Optional[int] = None):
+        self.id = id
+        self.name = sys.intern(name)
+        self.group_player_ids = tuple(group_player_ids)
+        self.final_rank = final_rank
+
+    @classmethod
+    def from_json(cls, p):
+        p = p['participant']
+        name = p.get('name') or p.get('username') or '<unknown>'
+        return cls(p.get('id'), name.strip(), p.get('group_player_ids') or (),
+                   p.get('final_rank'))
+
+
+class MatchRecord():
+    """A match, with player names and the round label filled in by
+    `resolve`."""
+    __slots__ = ('id', 'state', 'round_num', 'player1_id', 'player2_id',
+                 'winner_id', 'loser_id', 'suggested_play_order', 'underway',
+                 'updated_at', 'player1_prereq_match_id',
+                 'player2_prereq_match_id', 'player1_is_prereq_match_loser',
+                 'player2_is_prereq_match_loser', 'round', 'player1',
+                 'player2', 'winner', 'loser', 'resolved')
+
+    def __init__(self, id: int, player1_id: Optional[int],
+                 player2_id: Optional[int], player1: Optional[str] = None,
+                 player2: Optional[str] = None):
+        """An open match. The rest is filled in by `from_json`."""
+        self.id = id
+        self.state = 'open'
+        self.round_num = 0
+        self.player1_id = player1_id
+        self.player2_id = player2_id
+        self.winner_id = None
+        self.loser_id = None
+        self.suggested_play_order = None
+        self.underway = False
+        self.updated_at = None
+        self.player1_prereq_match_id = None
+        self.player2_prereq_match_id = None
+        self.player1_is_prereq_match_loser = False
+        self.player2_is_prereq_match_loser = False
+        self.round = None
+        self.player1 = _intern(player1)
+        self.player2 = _intern(player2)
+        self.winner = None
+        self.loser = None
+        # What the names were resolved against, see `resolve`.
+        self.resolved = None
+
+    @classmethod
+    def from_json(cls, m):
+        m = m['match']
+        record = cls(m['id'], m['player1_id'], m['player2_id'])
+        record.state = _intern(m['state'])
+        record.round_num = m['round']
+        record.winner_id = m['winner_id']
+        record.loser_id = m['loser_id']
+        record.suggested_play_order = m['suggested_play_order']
+        record.underway = m['underway_at'] is not None
+        record.updated_at = m.get('updated_at')
+        record.player1_prereq_match_id = m.get('player1_prereq_match_id')
+        record.player2_prereq_match_id = m.get('player2_prereq_match_id')
+        record.player1_is_prereq_match_loser = bool(
+            m.get('player1_is_prereq_match_loser'))
+        record.player2_is_prereq_match_loser = bool(
+            m.get('player2_is_prereq_match_loser'))
+        return record
+
+    def resolve(self, version, player_map: Dict[int, str], round_label: str):
+        """Fill in names from |player_map|, unless we already did for this
+        |version| of the participants and bracket."""
+        if self.resolved == version:
+            return
+        self.round = round_label
+        self.player1 = player_map[self.player1_id]
+        self.player2 = player_map[self.player2_id]
+        if self.winner_id is not None and self.loser_id is not None:
+            self.winner = player_map[self.winner_id]
+            self.loser = player_map[self.loser_id]
+        self.resolved = version
@@ -0,0 +1,60 @@
+"""Debounced match board refreshes."""
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Minimum number of seconds between two refreshes of the same tournament.
+REFRESH_WINDOW = 2
+
+
+class RefreshScheduler():
+    """Coalesces refresh requests for a tournament.
+
+    Runs |refresh| at most once per |window| seconds. Requests that come in
+    while a refresh is running, or before the window has passed, are folded
+    into a single trailing refresh.
+    """
+    def __init__(self, refresh, window: float = REFRESH_WINDOW):
+        self.refresh = refresh
+        self.window = window
+        self.dirty = False
+        self.last_run = 0
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def mark_dirty(self):
+        """Ask for a refresh soon."""
+        self.dirty = True
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    async def refresh_now(self):
+        """Refresh immediately. Covers any refresh that's pending."""
+        self.dirty = False
+        await self._refresh()
+
+    def cancel(self):
+        self.dirty = False
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    async def _run(self):
+        while self.dirty:
+            delay = self.last_run + self.window - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self.dirty = False
+            try:
+                await self._refresh()
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Error refreshing matches')
+
+    async def _refresh(self):
+        async with self.lock:
+            try:
+                await self.refresh()
+            finally:
+                self.last_run = time.monotonic()
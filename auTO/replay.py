@@ -0,0 +1,115 @@
+"""Profile the Challonge client against a recorded cassette.
+
+Record one with `RECORD_CASSETTE` in config.yml, or with
+`python -m auTO simulate --record CASSETTE`.
+
+Usage: python -m auTO replay CASSETTE [--latency MS] [--rate-limit] [--profile]
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import math
+import pstats
+import re
+import statistics
+import time
+from typing import List, Tuple
+
+from . import challonge
+from . import ratelimit
+from .transport import ReplayTransport
+
+REPORT_URL = re.compile(r'/matches/(\d+)\.json$')
+TOURNAMENT_URL = re.compile(r'(.+/tournaments)/([^/]+)\.json$')
+
+
+def read_cassette(path: str) -> Tuple[str, str, List]:
+    """The base URL and tournament id of the recording, and its reports as
+    (match id, winner id, scores)."""
+    base_url = tournament_id = None
+    reports = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            report = REPORT_URL.search(r['url'])
+            if r['method'] == 'PUT' and report is not None:
+                reports.append((int(report.group(1)),
+                                int(r['data']['match[winner_id]']),
+                                r['data']['match[scores_csv]']))
+                continue
+            tournament = TOURNAMENT_URL.match(r['url'])
+            if r['method'] == 'GET' and tournament is not None:
+                base_url, tournament_id = tournament.groups()
+    if tournament_id is None:
+        raise ValueError(f'No tournament requests in {path}')
+    return base_url, tournament_id, reports
+
+
+class Timer():
+    def __init__(self):
+        self.times = {}
+
+    async def time(self, name: str, aw):
+        start = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            self.times.setdefault(name, []).append(
+                time.perf_counter() - start)
+
+    def print(self):
+        for name, times in self.times.items():
+            print(f'  {name:14} x{len(times):<5} '
+                  f'mean {statistics.mean(times) * 1000:.2f}ms  '
+                  f'max {max(times) * 1000:.2f}ms')
+
+
+async def replay(path: str, latency: float, rate_limit: bool):
+    base_url, tournament_id, reports = read_cassette(path)
+    transport = ReplayTransport(path, latency)
+    gar = challonge.Challonge('replay', tournament_id, transport,
+                              base_url=base_url)
+    if not rate_limit:
+        # So the times are the client's own.
+        gar.bucket = ratelimit.TokenBucket(math.inf, math.inf)
+    timer = Timer()
+
+    await timer.time('get_raw', gar.get_raw())
+    await timer.time('get_matches', gar.get_matches())
+    # What auTO does for a report: send it and refresh the matches.
+    for match_id, winner_id, scores in reports:
+        await timer.time('report_match',
+                         gar.report_match(match_id, winner_id, scores))
+        await timer.time('get_matches', gar.get_matches())
+
+    print(f'Replayed {tournament_id} with {len(reports)} reports.')
+    timer.print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m auTO replay',
+        description='Replay recorded Challonge traffic through the client.')
+    parser.add_argument('cassette')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds added to every API call')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='throttle requests like a real API key')
+    parser.add_argument('--profile', action='store_true',
+                        help='print where the time went')
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    run = replay(args.cassette, args.latency / 1000, args.rate_limit)
+    if not args.profile:
+        loop.run_until_complete(run)
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    loop.run_until_complete(run)
+    profile.disable()
+    pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
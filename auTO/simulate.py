@@ -0,0 +1,202 @@
+"""Play a whole bracket against the fake Challonge server.
+
+Usage: python -m auTO simulate [-n ENTRANTS] [-r REPORTERS]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+from . import challonge
+from .fake_challonge import FakeChallonge
+from .transport import LiveTransport, RecordingTransport
+
+TOURNAMENT_ID = 'auto-simulation'
+
+
+class Simulation():
+    """Players reporting their own matches, as fast as they can."""
+    def __init__(self, gar: challonge.Challonge, reporters: int,
+                 game_time: float):
+        self.gar = gar
+        self.reporters = reporters
+        self.game_time = game_time
+        self.claimed = set()
+        self.latencies = []
+        # Set whenever a report might have opened new matches.
+        self.reported = asyncio.Event()
+
+    async def open_matches(self) -> List:
+        open_matches = [m for m in await self.gar.get_matches()
+                        if m.state == 'open']
+        if not open_matches and self.gar.unconfirmed:
+            # Like auTO, don't call it over on our own bookkeeping.
+            self.gar.invalidate('matches')
+            return await self.open_matches()
+        return open_matches
+
+    async def reporter(self):
+        while True:
+            open_matches = await self.open_matches()
+            available = [m for m in open_matches
+                         if m.id not in self.claimed]
+            if not available:
+                if not open_matches and not self.claimed:
+                    self.reported.set()
+                    return
+                self.reported.clear()
+                await self.reported.wait()
+                continue
+
+            match = random.choice(available)
+            self.claimed.add(match.id)
+            if self.game_time:
+                await asyncio.sleep(random.uniform(0, self.game_time))
+
+            winner = random.choice([match.player1_id, match.player2_id])
+            scores = random.choice(['2-0', '2-1'])
+            if winner == match.player2_id:
+                scores = scores[::-1]
+
+            # What auTO does for a report: send it and refresh the matches.
+            start = time.perf_counter()
+            await self.gar.report_match(match.id, winner, scores)
+            await self.gar.get_matches()
+            self.latencies.append(time.perf_counter() - start)
+            self.claimed.discard(match.id)
+            self.reported.set()
+
+    async def run(self):
+        await asyncio.gather(*(self.reporter()
+                               for _ in range(self.reporters)))
+
+
+def _ms(seconds: float) -> str:
+    return f'{seconds * 1000:.1f}ms'
+
+
+def deep_size(obj, seen=None) -> int:
+    """Rough bytes held by |obj| and everything it references."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif not isinstance(obj, (str, bytes, int, float)):
+        for slot in getattr(type(obj), '__slots__', ()):
+            size += deep_size(getattr(obj, slot, None), seen)
+        if hasattr(obj, '__dict__'):
+            size += deep_size(vars(obj), seen)
+    return size
+
+
+def state_size(gar: challonge.Challonge) -> int:
+    """Memory the client holds on to for its tournament."""
+    seen = set()
+    return sum(deep_size(state, seen) for state in (
+        gar.snapshots, gar.player_map, gar.participants, gar.matches))
+
+
+def print_report(server: FakeChallonge, sim: Simulation, elapsed: float,
+                 memory: int):
+    print(f'Played {len(sim.latencies)} matches in {elapsed:.2f}s.\n')
+    matches = len(sim.gar.snapshots['matches'].data)
+    print(f'Tournament state: {memory / 1024:.1f} KiB '
+          f'({memory // matches} bytes per match)\n')
+
+    print('API calls:')
+    for call, count in sorted(server.calls.items()):
+        print(f'  {count:6}  {call}')
+    print(f'  {sum(server.calls.values()):6}  total\n')
+
+    latencies = sorted(sim.latencies)
+    if not latencies:
+        return
+    p95 = latencies[int(.95 * (len(latencies) - 1))]
+    print('Report latency:')
+    print(f'  mean {_ms(statistics.mean(latencies))}  '
+          f'p50 {_ms(statistics.median(latencies))}  '
+          f'p95 {_ms(p95)}  max {_ms(latencies[-1])}')
+
+
+def print_top8(top8):
+    if not top8:
+        return
+    print('\nTop 8:')
+    for rank, players in top8:
+        print(f'  {rank}. {" / ".join(players)}')
+
+
+async def simulate(server: FakeChallonge, *, reporters: int = 8,
+                   game_time: float = 0, record: Optional[str] = None):
+    """Play out the bracket |server| holds for `TOURNAMENT_ID`."""
+    base_url = await server.start()
+    transport = LiveTransport()
+    if record:
+        transport = RecordingTransport(transport, record)
+
+    try:
+        gar = challonge.Challonge(server.api_key, TOURNAMENT_ID, transport,
+                                  base_url=base_url)
+        await gar.start()
+        await gar.get_raw()
+
+        sim = Simulation(gar, reporters, game_time)
+        start = time.perf_counter()
+        await sim.run()
+        elapsed = time.perf_counter() - start
+        memory = state_size(gar)
+
+        await gar.finalize()
+        top8 = await gar.get_top8()
+    finally:
+        await transport.close()
+        await server.stop()
+
+    print_report(server, sim, elapsed, memory)
+    print_top8(top8)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m auTO simulate',
+        description='Run a bracket against a local fake Challonge.')
+    parser.add_argument('-n', '--entrants', type=int, default=64)
+    parser.add_argument('-r', '--reporters', type=int, default=8,
+                        help='players reporting at the same time')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds added to every API call')
+    parser.add_argument('--game-time', type=float, default=0,
+                        help='maximum seconds a set takes')
+    parser.add_argument('--single', action='store_true',
+                        help='single instead of double elimination')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--record', metavar='CASSETTE',
+                        help='save the API calls for `python -m auTO replay`')
+    args = parser.parse_args(argv)
+
+    if args.entrants < 2:
+        parser.error('need at least 2 entrants')
+    random.seed(args.seed)
+    tournament_type = ('single elimination' if args.single
+                       else 'double elimination')
+
+    server = FakeChallonge(latency=args.latency / 1000)
+    server.add_tournament(
+        TOURNAMENT_ID, [f'Player {i}' for i in range(1, args.entrants + 1)],
+        tournament_type)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(simulate(
+        server, reporters=args.reporters, game_time=args.game_time,
+        record=args.record))
@@ -0,0 +1,146 @@
+"""Read-only tournament status over HTTP, for stream overlays and bracket
+viewers.
+
+Everything is rendered from what auTO already holds in memory, so polling it
+never reaches Challonge or Discord.
+"""
+import html
+import logging
+from typing import Callable, Iterable, List, Optional
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# Seconds browsers reload the HTML pages after.
+PAGE_REFRESH = 10
+
+
+def tournament_status(tourney) -> dict:
+    """The called matches, what's on deck and the progress of |tourney|."""
+    gar = tourney.gar
+    info = gar.info
+    matches = []
+    for match in sorted(tourney.called_matches.values(),
+                        key=lambda m: m.play_order or 0):
+        record = gar.match(match.id)
+        matches.append({
+            'id': match.id,
+            'round': record.round if record is not None else None,
+            'player1': match.player1_tag,
+            'player2': match.player2_tag,
+            'underway': record is not None and record.underway,
+        })
+    on_deck = [{
+        'id': d.match.id,
+        'round': d.round,
+        'waiting': d.waiting,
+        'feeder': d.feeder.id,
+        'loser': d.loser,
+    } for d in gar.on_deck()]
+    return {
+        'id': gar.tournament_id,
+        'name': info.name if info is not None else None,
+        'url': info.url if info is not None else None,
+        'state': info.state if info is not None else None,
+        'progress': info.progress_meter if info is not None else None,
+        'matches': matches,
+        'on_deck': on_deck,
+    }
+
+
+def _page(title: str, body: List[str]) -> web.Response:
+    text = '\n'.join([
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8">',
+        f'<meta http-equiv="refresh" content="{PAGE_REFRESH}">',
+        f'<title>{html.escape(title)}</title></head><body>',
+        *body,
+        '</body></html>',
+    ])
+    return web.Response(text=text, content_type='text/html')
+
+
+def _tournament_html(status: dict) -> web.Response:
+    name = status['name'] or status['id']
+    body = [f'<h1>{html.escape(name)}</h1>']
+    if status['progress'] is not None:
+        body.append(f'<p>{status["progress"]}% complete</p>')
+    body.append('<h2>Matches</h2><ul>')
+    for m in status['matches']:
+        players = html.escape(f'{m["player1"]} vs {m["player2"]}')
+        if m['underway']:
+            players = f'<em>{players}</em>'
+        body.append(f'<li><b>{html.escape(m["round"] or "")}</b>: '
+                    f'{players}</li>')
+    body.append('</ul>')
+    if status['on_deck']:
+        body.append('<h2>On deck</h2><ul>')
+        for d in status['on_deck']:
+            body.append(f'<li><b>{html.escape(d["round"])}</b>: '
+                        f'{html.escape(d["waiting"])}</li>')
+        body.append('</ul>')
+    if status['url']:
+        url = html.escape(status['url'])
+        body.append(f'<p><a href="{url}">{url}</a></p>')
+    return _page(name, body)
+
+
+class StatusServer():
+    """Serves the status of every tournament |tournaments| returns.
+
+    - `/` and `/tournaments.json` list them.
+    - `/tournaments/{id}` and `/tournaments/{id}.json` show one, by its
+      Challonge id.
+    """
+    def __init__(self, tournaments: Callable[[], Iterable]):
+        self.tournaments = tournaments
+        self.runner = None
+
+    def _find(self, tournament_id: str) -> Optional[dict]:
+        for tourney in self.tournaments():
+            if tourney.gar.tournament_id == tournament_id:
+                return tournament_status(tourney)
+        return None
+
+    def _get(self, request) -> dict:
+        status = self._find(request.match_info['id'])
+        if status is None:
+            raise web.HTTPNotFound()
+        return status
+
+    async def index(self, _request):
+        body = ['<h1>Tournaments</h1><ul>']
+        for tourney in self.tournaments():
+            tid = html.escape(tourney.gar.tournament_id)
+            info = tourney.gar.info
+            name = html.escape(info.name) if info is not None else tid
+            body.append(f'<li><a href="/tournaments/{tid}">{name}</a></li>')
+        body.append('</ul>')
+        return _page('Tournaments', body)
+
+    async def index_json(self, _request):
+        return web.json_response(
+            [tournament_status(t) for t in self.tournaments()])
+
+    async def tournament(self, request):
+        return _tournament_html(self._get(request))
+
+    async def tournament_json(self, request):
+        return web.json_response(self._get(request))
+
+    async def start(self, port: int, host: str = '127.0.0.1'):
+        app = web.Application()
+        app.router.add_get('/', self.index)
+        app.router.add_get('/tournaments.json', self.index_json)
+        app.router.add_get('/tournaments/{id}.json', self.tournament_json)
+        app.router.add_get('/tournaments/{id}', self.tournament)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        log.info(f'Serving tournament status on {host}:{port}.')
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
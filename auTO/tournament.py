@@ -1,26 +1,37 @@
 import asyncio
+import collections
 import logging
 from time import time
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 import discord
 from discord import ChannelType
 
+from .actor import Actor
 from . import challonge
+from .board import LiveBoard
 from .match import manage_channels, Match
+from .members import fold
+from .poller import Poller
+from .pool import ChannelPool
 from . import utils
 
 log = logging.getLogger(__name__)
 
 
+def _log_close_error(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        log.warning(f'Error closing match channels: {task.exception()}')
+
+
 class FakeContext():
     def __init__(self, guild, saved):
         self.guild = guild
         self.channel = guild.get_channel(saved.channel_id)
         self.author = guild.get_member(saved.owner_id)
 
-        if not (self.guild or self.channel or self.author):
-            raise ValueError('Error loading tournament')
+        if not (self.guild and self.channel and self.author):
+            raise ValueError('its channel or owner is gone')
 
 
 class TournamentPickle():
@@ -36,39 +47,130 @@ class TournamentPickle():
         self.matches = {}
 
 
+class PlayerIndex():
+    """Which of a guild's tournaments each player has a called match in, so
+    reports find their bracket from anywhere in the guild."""
+    def __init__(self):
+        # Casefolded player tag -> tournaments.
+        self.tournaments = collections.defaultdict(list)
+
+    def add(self, tag: str, tourney):
+        tourneys = self.tournaments[fold(tag)]
+        if tourney not in tourneys:
+            tourneys.append(tourney)
+
+    def remove(self, tag: str, tourney):
+        key = fold(tag)
+        tourneys = self.tournaments.get(key, [])
+        if tourney in tourneys:
+            tourneys.remove(tourney)
+        if not tourneys:
+            self.tournaments.pop(key, None)
+
+    def find(self, tag: str) -> List:
+        return list(self.tournaments.get(fold(tag), ()))
+
+
 class Tournament():
-    """Tournaments are unique to a guild."""
-    def __init__(self, ctx, tournament_id, api_key, session):
+    """A bracket run from one channel. A guild can run several at once, each
+    with its own channel and matches category."""
+    def __init__(self, ctx, tournament_id, api_key, transport, members,
+                 mutations, players, journal, stream_matches=False):
         self.guild = ctx.guild
+        self.members = members
+        # Queue for channel creation and deletion, shared by the guild.
+        self.mutations = mutations
+        # Called players in all the guild's tournaments.
+        self.players = players
+        self.journal = journal
         # The channel where matches are posted.
         self.channel = ctx.channel
         self.owner = ctx.author
-        self.previous_match_msgs = []
+        self.board = LiveBoard(self.channel)
         self.called_matches = {}
+        # Casefolded player tag -> id of their called match.
+        self.player_matches = {}
         self.recently_called = {}
         self.category = None
-        self.gar = challonge.Challonge(api_key, tournament_id, session)
+        self.pool = ChannelPool(self)
+        # Changes to the tournament's state go through here.
+        self.actor = Actor()
+        # The last of the Discord work handed off by the actor.
+        self.background = None
+        # Announcing the end and asking the owner to finalize.
+        self.finishing = None
+        # Set up by the cog, which knows how to refresh the match list.
+        self.refresher = None
+        self.poller = Poller(self)
+        self.gar = challonge.Challonge(api_key, tournament_id, transport,
+                                       stream_matches=stream_matches)
+
+    def in_background(self, factory) -> asyncio.Future:
+        """Run |factory|, a function returning a coroutine, after the
+        background work started before it.
+
+        For slow Discord calls the actor shouldn't wait on, like channel
+        setup and prompts.
+        """
+        previous = self.background
+
+        async def run():
+            if previous is not None:
+                await asyncio.wait([previous])
+            try:
+                await factory()
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Error in background tournament work')
+
+        self.background = asyncio.ensure_future(run())
+        return self.background
+
+    def stop_background(self):
+        for task in (self.background, self.finishing):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
+    async def save(self):
+        await self.journal.save_tournament(
+            self.guild.id, TournamentPickle(self))
+
+    async def save_match(self, match: Match):
+        await self.journal.save_match(
+            self.guild.id, self.gar.tournament_id, match.pickle())
+
+    async def forget(self):
+        await self.journal.delete_tournament(
+            self.guild.id, self.gar.tournament_id)
 
     async def get_open_matches(self):
         matches = await self.gar.get_matches()
-        return [m for m in matches if m['state'] == 'open']
+        return [m for m in matches if m.state == 'open']
 
     @manage_channels
     async def create_matches_category(self):
         if self.category is not None:
             return
         await self.delete_matches_category()
-        self.category = await self.guild.create_category('matches')
+        self.category = await self.guild.create_category(self.category_name)
+        await self.save()
+
+    @property
+    def category_name(self) -> str:
+        return f'{self.channel.name} matches'
 
     @manage_channels
     async def delete_matches_category(self):
         """Delete matches category and all its channels."""
-        existing_categories = self.get_channels(
-            'matches', ChannelType.category)
+        self.pool.clear()
+        existing_categories = set(self.get_channels(
+            self.category_name, ChannelType.category))
+        if self.category is not None:
+            existing_categories.add(self.category)
         for c in existing_categories:
             try:
-                await asyncio.gather(*(chan.delete() for chan in c.channels))
-                await c.delete()
+                await asyncio.gather(*(self.mutations.delete(chan.delete)
+                                       for chan in c.channels))
+                await self.mutations.delete(c.delete)
             # We can't delete channels not created by us.
             except discord.HTTPException as e:
                 log.warning(e)
@@ -89,17 +191,48 @@ class Tournament():
 
         await self.gar.mark_underway(match_id)
 
-    def find_match(self, username: str) -> Match:
-        for _, match in self.called_matches.items():
-            if match.has_player(username):
-                return match
-        return None
+    def find_match(self, username: str) -> Optional[Match]:
+        match_id = self.player_matches.get(fold(username))
+        if match_id is None:
+            return None
+        return self.called_matches.get(match_id)
+
+    def add_match(self, match: Match):
+        self.called_matches[match.id] = match
+        self.index_match(match)
+
+    def remove_match(self, match: Match):
+        self.called_matches.pop(match.id, None)
+        self.unindex_match(match)
+
+    def index_match(self, match: Match):
+        for tag in (match.player1_tag, match.player2_tag):
+            self.player_matches[fold(tag)] = match.id
+            self.players.add(tag, self)
+
+    def unindex_match(self, match: Match):
+        for tag in (match.player1_tag, match.player2_tag):
+            key = fold(tag)
+            if self.player_matches.get(key) == match.id:
+                del self.player_matches[key]
+                self.players.remove(tag, self)
 
     async def report_match(self, match, winner_id, reporter, scores_csv):
         self._add_to_recently_called(match, reporter)
         await self.gar.report_match(match.id, winner_id, scores_csv)
-        await match.close()
-        self.called_matches.pop(match.id)
+        await self.close_match(match)
+
+    async def close_match(self, match):
+        """Stop tracking a match that's no longer open.
+
+        Its channels are cleaned up in the background, since cleanup waits
+        behind every channel the guild is still creating.
+        """
+        self.remove_match(match)
+        task = asyncio.ensure_future(match.close())
+        task.add_done_callback(_log_close_error)
+        await self.journal.delete_match(
+            self.guild.id, self.gar.tournament_id, match.id)
 
     def _add_to_recently_called(self, match, reporter):
         """Prevent both players from reporting at the same time."""
@@ -127,10 +260,37 @@ class Tournament():
             return []
         message = ['Missing Discord accounts for the following players:']
         for p in missing:
-            message.append(f'- {p}')
+            line = f'- {p}'
+            if self.members.is_ambiguous(p):
+                line += ' (multiple members have this name)'
+            else:
+                suggestions = self.members.suggest(p)
+                if suggestions:
+                    names = ', '.join(m.display_name for m in suggestions)
+                    line += f' (did you mean {names}?)'
+            message.append(line)
         await utils.send_list(dms, message)
         return missing
 
+    def suggest_members(self, tags: List[str]) -> Dict[str, discord.Member]:
+        """The closest member for each tag that has one."""
+        suggestions = {}
+        for tag in tags:
+            if self.members.is_ambiguous(tag):
+                continue
+            best = self.members.suggest(tag, limit=1)
+            if best:
+                suggestions[tag] = best[0]
+        return suggestions
+
+    def has_channel(self, channel) -> bool:
+        """Whether |channel| is where this tournament runs, or one of its
+        match channels."""
+        if channel == self.channel:
+            return True
+        return (self.category is not None and
+                getattr(channel, 'category_id', None) == self.category.id)
+
     def permissions(self) -> discord.Permissions:
         """Gets our permissions on the server."""
         return self.channel.permissions_for(self.guild.me)
@@ -145,10 +305,7 @@ class Tournament():
 
     def get_user(self, username: str) -> Optional[discord.Member]:
         """Get member by username."""
-        for m in self.guild.members:
-            if utils.istrcmp(m.display_name, username):
-                return m
-        return None
+        return self.members.get(username)
 
     async def dq(self, user: discord.Member):
         await self.gar.dq(user.display_name)
@@ -179,12 +336,15 @@ class Tournament():
         channel_names = set()
 
         for m in open_matches:
-            player1 = m['player1']
-            player2 = m['player2']
+            player1 = m.player1
+            player2 = m.player2
             channel_names.add(self._create_channel_name(player1, player2))
             channel_names.add(self._create_channel_name(player2, player1))
+        pooled = self.pool.ids()
         try:
-            await asyncio.gather(*(c.delete() for c in self.category.channels
-                                   if c.name not in channel_names))
+            await asyncio.gather(*(self.mutations.delete(c.delete)
+                                   for c in self.category.channels
+                                   if c.name not in channel_names and
+                                   c.id not in pooled))
         except discord.HTTPException as e:
             log.warning(e)
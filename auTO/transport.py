@@ -0,0 +1,194 @@
+"""How the Challonge client talks to Challonge.
+
+`LiveTransport` makes real requests. `RecordingTransport` saves the requests
+and responses going through another transport to a cassette file, which
+`ReplayTransport` serves back, so the client can be profiled and tested
+offline against real tournament payloads.
+"""
+import abc
+import asyncio
+import collections
+import concurrent.futures
+import json
+import logging
+from typing import Optional
+
+import aiohttp
+from aiohttp.client_exceptions import ClientResponseError
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+log = logging.getLogger(__name__)
+
+Response = collections.namedtuple('Response', ['status', 'headers', 'body'])
+
+# Connections kept open to Challonge, shared by every tournament.
+MAX_CONNECTIONS = 20
+TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+# Response headers the client looks at, the only ones cassettes keep.
+KEPT_HEADERS = ('ETag', 'Last-Modified', 'Retry-After', 'Content-Type')
+
+
+async def read_body(r) -> bytes:
+    return await r.read()
+
+
+class Transport(abc.ABC):
+    @abc.abstractmethod
+    async def request(self, method: str, url: str, read=read_body,
+                      **kwargs) -> Response:
+        """Make a request. The body of the returned response is whatever
+        |read| makes of the response. Raises ClientResponseError for error
+        statuses."""
+
+    async def close(self):
+        pass
+
+
+class LiveTransport(Transport):
+    """Requests over a keep-alive connection pool."""
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self.owns_session = session is None
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=MAX_CONNECTIONS, ttl_dns_cache=300,
+                keepalive_timeout=60)
+            session = aiohttp.ClientSession(
+                connector=connector, timeout=TIMEOUT, raise_for_status=True)
+        self.session = session
+
+    async def request(self, method: str, url: str, read=read_body,
+                      **kwargs) -> Response:
+        async with self.session.request(method, url, **kwargs) as r:
+            return Response(r.status, r.headers, await read(r))
+
+    async def close(self):
+        if self.owns_session:
+            await self.session.close()
+
+
+def _public(fields) -> dict:
+    """Request fields, minus the API key."""
+    return {k: str(v) for k, v in (fields or {}).items() if k != 'api_key'}
+
+
+def _key(method: str, url: str, data) -> str:
+    return json.dumps([method, url, _public(data)], sort_keys=True)
+
+
+class _Content():
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def iter_chunked(self, n: int):
+        for i in range(0, len(self.body), n):
+            yield self.body[i:i + n]
+
+
+class _Recorded():
+    """Enough of aiohttp's response for the client's readers."""
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.content = _Content(body)
+        self.body = body
+
+    async def read(self) -> bytes:
+        return self.body
+
+
+def _error(method: str, url: str, status: int,
+           headers) -> ClientResponseError:
+    info = aiohttp.RequestInfo(URL(url), method, CIMultiDictProxy(
+        CIMultiDict()), URL(url))
+    return ClientResponseError(info, (), status=status, headers=headers)
+
+
+class RecordingTransport(Transport):
+    """Saves every request made through |transport| to a cassette file.
+
+    API keys are left out. Responses are read whole, so streamed reads
+    aren't streamed while recording.
+    """
+    def __init__(self, transport: Transport, path: str):
+        self.transport = transport
+        self.path = path
+        # A single thread keeps writes in order.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    async def request(self, method: str, url: str, read=read_body,
+                      **kwargs) -> Response:
+        try:
+            resp = await self.transport.request(method, url, **kwargs)
+        except ClientResponseError as e:
+            await self._record(method, url, kwargs,
+                               Response(e.status, e.headers, b''))
+            raise
+        await self._record(method, url, kwargs, resp)
+        body = await read(_Recorded(resp.status, resp.headers, resp.body))
+        return Response(resp.status, resp.headers, body)
+
+    async def _record(self, method, url, kwargs, resp: Response):
+        headers = resp.headers or {}
+        line = json.dumps({
+            'method': method,
+            'url': url,
+            'data': _public(kwargs.get('data')),
+            'status': resp.status,
+            'headers': {h: headers[h] for h in KEPT_HEADERS if h in headers},
+            'body': resp.body.decode(),
+        }) + '\n'
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self._append, line)
+
+    def _append(self, line: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        await self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """Serves the responses in a cassette, in the order they were recorded.
+
+    Once a request's recorded responses run out, the last one is repeated.
+    A recorded 304 is only served to requests that have the matching ETag,
+    others get the last full response instead. |latency| seconds are added
+    to every request.
+    """
+    def __init__(self, path: str, latency: float = 0):
+        self.latency = latency
+        self.recorded = collections.defaultdict(collections.deque)
+        # The last full response for each request, for replaying 304s.
+        self.full = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    key = _key(r['method'], r['url'], r['data'])
+                    self.recorded[key].append(r)
+
+    async def request(self, method: str, url: str, read=read_body,
+                      **kwargs) -> Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        key = _key(method, url, kwargs.get('data'))
+        responses = self.recorded.get(key)
+        if not responses:
+            raise ValueError(f'No recorded response for {method} {url}')
+        r = responses.popleft() if len(responses) > 1 else responses[0]
+
+        etag = (kwargs.get('headers') or {}).get('If-None-Match')
+        if r['status'] == 304 and etag != r['headers'].get('ETag'):
+            r = self.full.get(key, r)
+        elif r['status'] != 304:
+            self.full[key] = r
+
+        headers = CIMultiDictProxy(CIMultiDict(r['headers']))
+        if r['status'] >= 400:
+            raise _error(method, url, r['status'], headers)
+        body = r['body'].encode()
+        return Response(r['status'], headers,
+                        await read(_Recorded(r['status'], headers, body)))
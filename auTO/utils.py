@@ -10,22 +10,28 @@ def istrcmp(a: str, b: str) -> bool:
     return a.lower() == b.lower()
 
 
-async def send_list(ctx: discord.abc.Messageable, the_list: List[str]) -> List:
-    """Send multi-line messages. Split messages longer than 2000 characters."""
+def chunk_lines(the_list: List[str]) -> List[str]:
+    """Join lines into messages of at most 2000 characters."""
     max_chars = 2000
     contents = ''
-    msgs = []
+    chunks = []
 
     for line in the_list:
-        if len(contents) + len(line) + 1 > max_chars:
-            msg = await ctx.send(contents)
-            msgs.append(msg)
+        if contents and len(contents) + len(line) + 1 > max_chars:
+            chunks.append(contents)
             contents = ''
         contents += line + '\n'
     if contents:
-        msg = await ctx.send(contents)
-        msgs.append(msg)
+        chunks.append(contents)
+
+    return chunks
 
+
+async def send_list(ctx: discord.abc.Messageable, the_list: List[str]) -> List:
+    """Send multi-line messages. Split messages longer than 2000 characters."""
+    msgs = []
+    for chunk in chunk_lines(the_list):
+        msgs.append(await ctx.send(chunk))
     return msgs
 
 
@@ -16,6 +16,7 @@ setup(
         'discord.py >= 1.5.1',
         'pyyaml',
     ],
+    extras_require={'fast': ['orjson']},
     setup_requires=['wheel'],
     python_requires='>=3.7',
     entry_points={'console_scripts': ['auTO=auTO.auTO:main']},